@@ -5,7 +5,7 @@ from app.db.mongo import get_db, log_error
 from pymongo.database import Database
 import random
 import string
-from app.auth.utils import send_password_email, create_access_token, create_refresh_token
+from app.auth.utils import send_password_email, create_access_token, create_refresh_token, invalidate_cached_user
 from app.core.config import settings
 from jose import JWTError, jwt
 import hashlib
@@ -63,6 +63,9 @@ async def request_login(
             }
             await users_collection.insert_one(new_user)
 
+        # The password was rotated, so don't keep serving the old user document
+        invalidate_cached_user(email)
+
         # Add the email sending task directly to background_tasks
         background_tasks.add_task(send_password_email, email, password)
         
@@ -11,6 +11,9 @@ from fastapi import Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.db.mongo import get_db
 from pymongo.database import Database
+from collections import OrderedDict
+from typing import Optional, Tuple
+import time
 async def handle_validation_error(request: Request, exc: RequestValidationError):
     """Handle validation errors and log them to MongoDB"""
     await log_error(
@@ -111,6 +114,38 @@ async def create_refresh_token(data: dict)->str:
 # Create HTTPBearer instance for extracting Bearer tokens
 security = HTTPBearer()
 
+#Authenticated users by email: email -> (monotonic expiry, user document), most recently used last
+user_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+def get_cached_user(email: str) -> Optional[dict]:
+    """
+    Return the cached user document for an email, or None if it is not cached or has expired
+    """
+    entry = user_cache.get(email)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if time.monotonic() >= expires_at:
+        user_cache.pop(email, None)
+        return None
+    user_cache.move_to_end(email)
+    return dict(user)
+
+def cache_user(email: str, user: dict):
+    """
+    Cache a user document for USER_CACHE_TTL_SECONDS, evicting the least recently used beyond USER_CACHE_MAX_SIZE
+    """
+    user_cache[email] = (time.monotonic() + settings.USER_CACHE_TTL_SECONDS, dict(user))
+    user_cache.move_to_end(email)
+    while len(user_cache) > settings.USER_CACHE_MAX_SIZE:
+        user_cache.popitem(last=False)
+
+def invalidate_cached_user(email: str):
+    """
+    Drop a user from this process' cache (other API processes catch up within USER_CACHE_TTL_SECONDS)
+    """
+    user_cache.pop(email, None)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Database = Depends(get_db)
@@ -149,6 +184,11 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
+        # The token is still verified on every request, only the user document is cached
+        user = get_cached_user(email)
+        if user is not None:
+            return user
+
         # Find user in database
         users_collection = db["users"]
         user = await users_collection.find_one({"email": email})
@@ -159,7 +199,8 @@ async def get_current_user(
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-            
+
+        cache_user(email, user)
         return user
         
     except JWTError:
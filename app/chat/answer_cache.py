@@ -0,0 +1,113 @@
+'''
+Note: Exact-match answer cache for chat questions.
+
+The same question on the same data gets the same answer, whether it is asked again after a refresh or by a
+colleague on a copy of the file. Answers are keyed on (dataset content hash, normalized question, model) and
+kept in an in-process LRU in front of the "answer_cache" collection (entries expire after
+ANSWER_CACHE_TTL_SECONDS, a TTL index on expires_at removes them from Mongo).
+A hit is served without leasing a container or calling the model.
+
+The key has no conversation history in it, so /chat only looks up and stores the opening question of a
+session: a follow-up ("and by month?") depends on the turns before it. Callers can pass use_cache=False to
+bypass the cache entirely.
+'''
+import hashlib
+import re
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+from app.core.config import settings
+from app.core.metrics import register_counter
+from app.db.mongo import get_db, log_error
+
+# "memory_hit" | "mongo_hit" | "miss" -> count
+ANSWER_CACHE_STATS: Counter = Counter()
+register_counter("answer_cache_lookups_total", "Answer cache lookups by outcome", ANSWER_CACHE_STATS, ["outcome"])
+
+# key -> cached answer document (includes expires_at), most recently used last
+answer_lru: "OrderedDict[str, dict]" = OrderedDict()
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.casefold()).strip()
+    return question.rstrip(" ?!.")
+
+def answer_cache_key(content_key: str, question: str, model: str) -> str:
+    return hashlib.sha256(f"{content_key}\n{model}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+def _remember(key: str, entry: dict):
+    answer_lru[key] = entry
+    answer_lru.move_to_end(key)
+    while len(answer_lru) > settings.ANSWER_CACHE_LRU_SIZE:
+        answer_lru.popitem(last=False)
+
+async def get_cached_answer(content_key: str, question: str, model: str) -> Optional[dict]:
+    """
+    Return the cached answer (response, code, code_explanation, file_url, message_id) or None.
+    An explanation generated after the answer was cached is picked up from the source message.
+    """
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+
+    key = answer_cache_key(content_key, question, model)
+    now = datetime.utcnow()
+    try:
+        entry = answer_lru.get(key)
+        if entry is not None and entry["expires_at"] > now:
+            answer_lru.move_to_end(key)
+            ANSWER_CACHE_STATS["memory_hit"] += 1
+        else:
+            answer_lru.pop(key, None)
+            db = await get_db()
+            entry = await db["answer_cache"].find_one(
+                {"key": key, "expires_at": {"$gt": now}},
+                projection={"_id": 0}
+            )
+            if entry is None:
+                ANSWER_CACHE_STATS["miss"] += 1
+                return None
+            ANSWER_CACHE_STATS["mongo_hit"] += 1
+            _remember(key, entry)
+
+        if entry.get("code") and not entry.get("code_explanation") and entry.get("message_id"):
+            db = await get_db()
+            source = await db["messages"].find_one(
+                {"_id": ObjectId(entry["message_id"])},
+                projection={"metadata.code_explanation": 1}
+            )
+            code_explanation = ((source or {}).get("metadata") or {}).get("code_explanation")
+            if code_explanation:
+                entry["code_explanation"] = code_explanation
+                await db["answer_cache"].update_one({"key": key}, {"$set": {"code_explanation": code_explanation}})
+
+        return entry
+
+    except Exception as e:
+        await log_error(error=e, location="get_cached_answer", additional_info={"content_key": content_key})
+        return None
+
+async def store_answer(content_key: str, question: str, model: str, answer: dict):
+    """
+    Cache a freshly generated answer (response, code, code_explanation, file_url, message_id)
+    """
+    if not settings.ANSWER_CACHE_ENABLED:
+        return
+
+    key = answer_cache_key(content_key, question, model)
+    now = datetime.utcnow()
+    entry = {
+        "key": key,
+        "content_key": content_key,
+        "model": model,
+        "question": normalize_question(question),
+        **answer,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=settings.ANSWER_CACHE_TTL_SECONDS)
+    }
+    try:
+        db = await get_db()
+        await db["answer_cache"].update_one({"key": key}, {"$set": entry}, upsert=True)
+        _remember(key, entry)
+    except Exception as e:
+        await log_error(error=e, location="store_answer", additional_info={"content_key": content_key})
@@ -0,0 +1,148 @@
+'''
+Note: Conversation history for chat prompts.
+
+Instead of sending every message of a session on every turn, the prompt gets a rolling summary of older turns
+plus every later turn, as long as they fit in the window (CHAT_HISTORY_MAX_MESSAGES and a token budget).
+The summary lives on the csv_sessions document and is extended incrementally, so it is never recomputed from
+scratch: after each turn in the background, leaving room in the window for the next turn, and on the request
+itself only when a turn outgrew the window anyway.
+'''
+from datetime import datetime
+from typing import List, Optional
+from app.core.config import settings
+from app.db.mongo import get_db, log_error
+from app.core.tracing import span
+from app.llm.openai_client import get_openai_client
+from app.chat.utils import format_conversation_history
+
+# Only what the prompt needs (created_at marks the window boundary)
+HISTORY_PROJECTION = {"_id": 0, "role": 1, "content": 1, "created_at": 1}
+
+# Room the background fold leaves in the window for the next turn (its question and answer)
+FOLD_HEADROOM_MESSAGES = 2
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token), good enough for budgeting the prompt
+    """
+    return len(text) // 4 + 1
+
+def fit_window(messages: List[dict], max_messages: int, token_budget: int) -> List[dict]:
+    """
+    The newest of messages (given oldest first) that fit in max_messages and token_budget, oldest first
+    """
+    window = []
+    used_tokens = 0
+    # Walk newest to oldest so the most recent turns always make it in
+    for msg in reversed(messages[-max_messages:] if max_messages > 0 else []):
+        msg_tokens = estimate_tokens(f"{msg['role']}: {msg['content']}")
+        if window and used_tokens + msg_tokens > token_budget:
+            break
+        window.append(msg)
+        used_tokens += msg_tokens
+
+    window.reverse()
+    return window
+
+async def get_unsummarized_messages(db, session_id: str, summarized_until: Optional[datetime]) -> List[dict]:
+    """
+    Every message of a session newer than the rolling summary, oldest first
+    """
+    query = {"session_id": session_id}
+    if summarized_until:
+        query["created_at"] = {"$gt": summarized_until}
+    return await db["messages"].find(query, projection=HISTORY_PROJECTION).sort("created_at", 1).to_list(length=None)
+
+async def fold_into_summary(db, session_id: str, history_summary: dict, aged_out: List[dict]) -> str:
+    """
+    Extend the rolling summary with aged_out (the oldest unsummarized messages) and store it.
+    Returns the new summary text.
+    """
+    openai_client = await get_openai_client()
+    with span("llm_history_summary") as stage:
+        response = await openai_client.responses.create(
+            model="gpt-4.1-mini",
+            input=f"""
+            Current summary of the conversation so far:
+            {history_summary.get("text") or "(empty)"}
+
+            New messages to fold into the summary:
+            {format_conversation_history(aged_out)}
+
+            Return the updated summary. Keep the questions asked, the answers and numbers found, and any
+            preferences the user stated. Keep it under 200 words.
+            """,
+            instructions="You maintain a running summary of a data analysis chat between a user and an assistant.",
+            timeout=300
+        )
+        stage.set_usage(response)
+
+    # Only write if nobody else extended the summary in the meantime
+    await db["csv_sessions"].update_one(
+        {"session_id": session_id, "history_summary.summarized_until": history_summary.get("summarized_until")},
+        {"$set": {
+            "history_summary": {
+                "text": response.output_text,
+                "summarized_until": aged_out[-1]["created_at"],
+                "message_count": history_summary.get("message_count", 0) + len(aged_out),
+                "updated_at": datetime.utcnow()
+            }
+        }}
+    )
+    return response.output_text
+
+async def get_conversation_history(db, session: dict) -> str:
+    """
+    Build the conversation history for the chat prompt: the rolling summary of older turns followed by every
+    message after it that fits in the window. Messages that no longer fit are folded into the summary first,
+    so no turn is ever left out of both.
+    """
+    history_summary = session.get("history_summary") or {}
+    messages = await get_unsummarized_messages(db, session["session_id"], history_summary.get("summarized_until"))
+    window = fit_window(messages, settings.CHAT_HISTORY_MAX_MESSAGES, settings.CHAT_HISTORY_TOKEN_BUDGET)
+    aged_out = messages[:len(messages) - len(window)]
+
+    summary_text = history_summary.get("text")
+    if aged_out:
+        # The background fold keeps room for a turn, so this only runs when a turn outgrew the token budget
+        try:
+            summary_text = await fold_into_summary(db, session["session_id"], history_summary, aged_out)
+        except Exception as e:
+            await log_error(error=e, location="get_conversation_history", additional_info={"session_id": session["session_id"]})
+            # Over budget beats silently dropping turns
+            window = messages
+
+    conversation_history = ""
+    if summary_text:
+        conversation_history += f"Summary of the earlier conversation: {summary_text}\n"
+    conversation_history += format_conversation_history(window)
+    return conversation_history
+
+async def update_history_summary(session_id: str):
+    """
+    Fold older messages into the session's rolling summary, leaving FOLD_HEADROOM_MESSAGES of room in the
+    window so the next turn still fits without a fold on its own time.
+    Runs after a turn is answered, so it never adds latency to the answer itself.
+    """
+    try:
+        db = await get_db()
+        session = await db["csv_sessions"].find_one(
+            {"session_id": session_id},
+            projection={"history_summary": 1}
+        )
+        if session is None:
+            return
+
+        history_summary = session.get("history_summary") or {}
+        messages = await get_unsummarized_messages(db, session_id, history_summary.get("summarized_until"))
+        window = fit_window(
+            messages,
+            settings.CHAT_HISTORY_MAX_MESSAGES - FOLD_HEADROOM_MESSAGES,
+            settings.CHAT_HISTORY_TOKEN_BUDGET
+        )
+        aged_out = messages[:len(messages) - len(window)]
+        if aged_out:
+            await fold_into_summary(db, session_id, history_summary, aged_out)
+
+    except Exception as e:
+        await log_error(error=e, location="update_history_summary", additional_info={"session_id": session_id})
@@ -0,0 +1,349 @@
+'''
+Note: Streaming CSV profiler.
+
+The upload route feeds every chunk it streams to Azure into a CSVProfiler, so the whole file gets profiled
+without ever being held in memory. Text is buffered until about PROFILER_BATCH_BYTES of complete rows are
+available (a newline outside of quotes), then the batch is parsed with pandas and folded into bounded
+per-column sketches:
+
+- HyperLogLog registers for approximate distinct counts
+- a bottom-k random sample (uniform over the whole file) for approximate quantiles
+- a Misra-Gries summary for approximate top values
+'''
+import codecs
+from io import StringIO
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# Parse buffered text in batches of roughly this many bytes of complete rows
+PROFILER_BATCH_BYTES = 1024 * 1024
+
+# Give up (rather than hold the rest of the file in memory) when no row ends within this much text
+PROFILER_MAX_PENDING_BYTES = 8 * PROFILER_BATCH_BYTES
+
+# Values treated as null (a subset of pandas' defaults)
+NULL_VALUES = {"", "na", "n/a", "nan", "null", "none", "-", "#n/a"}
+
+# HyperLogLog precision: 2**11 registers per column, ~2.3% standard error
+HLL_PRECISION = 11
+
+# Size of the per-column random sample used for quantiles
+QUANTILE_SAMPLE_SIZE = 2048
+
+# Counters kept per column for top values, and how many of them are reported
+TOP_K_CAPACITY = 64
+TOP_K_REPORTED = 5
+
+class HyperLogLog:
+    """Approximate distinct counter over pandas' 64-bit value hashes"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        value_bits = 64 - self.precision
+        index = (hashes >> np.uint64(value_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+        # Rank = position of the leftmost 1 bit in the remaining bits (value_bits + 1 when they are all zero)
+        with np.errstate(divide="ignore"):
+            bit_length = np.where(remainder > 0, np.floor(np.log2(remainder.astype(np.float64))) + 1, 0)
+        rank = (value_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        # Small range correction (linear counting)
+        if estimate <= 2.5 * m and empty_registers:
+            estimate = m * np.log(m / empty_registers)
+        return int(round(estimate))
+
+class ColumnProfile:
+    """Bounded-memory statistics for one column"""
+
+    def __init__(self, name: str, rng: np.random.Generator):
+        self.name = name
+        self.rng = rng
+        self.null_count = 0
+        self.non_null_count = 0
+        # How many non-null values parsed as each type
+        self.integer_count = 0
+        self.numeric_count = 0
+        self.non_numeric_count = 0
+        self.boolean_count = 0
+        self.datetime_count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.sum = 0.0
+        self.min_datetime: Optional[pd.Timestamp] = None
+        self.max_datetime: Optional[pd.Timestamp] = None
+        self.distinct = HyperLogLog()
+        self.sample_values = np.empty(0, dtype=np.float64)
+        self.sample_keys = np.empty(0, dtype=np.float64)
+        self.top_counts: Dict[str, int] = {}
+
+    def update(self, values: pd.Series):
+        stripped = values.str.strip()
+        is_null = stripped.str.lower().isin(NULL_VALUES)
+        present = stripped[~is_null]
+        self.null_count += int(is_null.sum())
+        self.non_null_count += len(present)
+        if present.empty:
+            return
+
+        self.distinct.add_hashes(pd.util.hash_pandas_object(present, index=False).to_numpy())
+        self._update_top_values(present)
+
+        # Once a column has text in it, it can no longer be numeric, so stop parsing numbers
+        if self.non_numeric_count == 0:
+            numeric = pd.to_numeric(present, errors="coerce")
+            numeric = numeric[numeric.notna()]
+        else:
+            numeric = present.iloc[:0]
+        if not numeric.empty:
+            self.numeric_count += len(numeric)
+            self.integer_count += int(present[numeric.index].str.fullmatch(r"[+-]?\d+").sum())
+            batch_min, batch_max = float(numeric.min()), float(numeric.max())
+            self.min = batch_min if self.min is None else min(self.min, batch_min)
+            self.max = batch_max if self.max is None else max(self.max, batch_max)
+            self.sum += float(numeric.sum())
+            self._update_sample(numeric.to_numpy(dtype=np.float64))
+
+        non_numeric = present.drop(numeric.index)
+        if non_numeric.empty:
+            return
+        self.boolean_count += int(non_numeric.str.lower().isin({"true", "false", "yes", "no"}).sum())
+
+        # Only keep trying dates while every earlier non-numeric value has been one (text columns stop paying for it)
+        dates_so_far = self.datetime_count == self.non_numeric_count
+        self.non_numeric_count += len(non_numeric)
+        if dates_so_far:
+            # utc=True so mixed offsets (and naive values) land on one comparable timeline
+            dates = pd.to_datetime(non_numeric, errors="coerce", format="ISO8601", utc=True)
+            dates = dates[dates.notna()]
+            if not dates.empty:
+                self.datetime_count += len(dates)
+                self.min_datetime = dates.min() if self.min_datetime is None else min(self.min_datetime, dates.min())
+                self.max_datetime = dates.max() if self.max_datetime is None else max(self.max_datetime, dates.max())
+
+    def _update_sample(self, numbers: np.ndarray):
+        # Keeping the values with the smallest random keys gives a uniform sample of everything seen so far
+        keys = np.concatenate([self.sample_keys, self.rng.random(len(numbers))])
+        numbers = np.concatenate([self.sample_values, numbers])
+        if len(keys) > QUANTILE_SAMPLE_SIZE:
+            keep = np.argpartition(keys, QUANTILE_SAMPLE_SIZE)[:QUANTILE_SAMPLE_SIZE]
+            keys, numbers = keys[keep], numbers[keep]
+        self.sample_keys, self.sample_values = keys, numbers
+
+    def _update_top_values(self, present: pd.Series):
+        # Misra-Gries merge: counts are lower bounds, off by at most rows / (TOP_K_CAPACITY + 1)
+        batch_counts = present.value_counts()
+        if len(batch_counts) > TOP_K_CAPACITY:
+            # Reduce the batch to a summary of its own first, merging two summaries keeps the same bound
+            cutoff = batch_counts.iloc[TOP_K_CAPACITY]
+            batch_counts = batch_counts[batch_counts > cutoff] - cutoff
+        for value, count in batch_counts.items():
+            self.top_counts[value] = self.top_counts.get(value, 0) + int(count)
+        if len(self.top_counts) > TOP_K_CAPACITY:
+            counts = sorted(self.top_counts.values(), reverse=True)
+            cutoff = counts[TOP_K_CAPACITY]
+            self.top_counts = {
+                value: count - cutoff for value, count in self.top_counts.items() if count > cutoff
+            }
+
+    def dtype(self) -> str:
+        if self.non_null_count == 0:
+            return "empty"
+        if self.integer_count == self.non_null_count:
+            return "integer"
+        if self.numeric_count == self.non_null_count:
+            return "float"
+        if self.boolean_count == self.non_null_count:
+            return "boolean"
+        if self.datetime_count == self.non_null_count:
+            return "datetime"
+        return "string"
+
+    def to_dict(self) -> dict:
+        dtype = self.dtype()
+        profile = {
+            "name": self.name,
+            "dtype": dtype,
+            "null_count": self.null_count,
+            "distinct_count": min(self.distinct.count(), self.non_null_count),
+        }
+        if dtype in ("integer", "float"):
+            quantiles = np.quantile(self.sample_values, [0.25, 0.5, 0.75]) if len(self.sample_values) else []
+            profile.update({
+                "min": self.min,
+                "max": self.max,
+                "mean": self.sum / self.numeric_count,
+                "quantiles": {name: float(q) for name, q in zip(("p25", "p50", "p75"), quantiles)},
+            })
+        elif dtype == "datetime":
+            profile.update({"min": self.min_datetime.isoformat(), "max": self.max_datetime.isoformat()})
+        else:
+            top_values = sorted(self.top_counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K_REPORTED]
+            profile["top_values"] = [{"value": value, "count": count} for value, count in top_values]
+        return profile
+
+class RowBatchOverflow(Exception):
+    """A single row (or an unterminated quoted field) grew past the batcher's max_pending_bytes"""
+
+class CSVRowBatcher:
+    """
+    Turns raw byte chunks of a CSV into text batches of complete rows (about batch_bytes each).
+    Shared by everything that processes an upload while it streams.
+
+    Quote state is tracked incrementally, so every character is scanned once. A quote only opens a quoted
+    field at the start of a field (as pandas and pyarrow read it); a stray quote inside an unquoted value is
+    just text. If no row ends within max_pending_bytes, feed() raises RowBatchOverflow instead of buffering
+    the rest of the file.
+    """
+
+    def __init__(self, batch_bytes: int = PROFILER_BATCH_BYTES, max_pending_bytes: int = PROFILER_MAX_PENDING_BYTES):
+        self.batch_bytes = batch_bytes
+        self.max_pending_bytes = max(max_pending_bytes, batch_bytes)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.buffer = ""
+        # How much of the buffer has been scanned, whether that point is inside a quoted field,
+        # and the index just past the last row boundary found so far (0 if none)
+        self.scanned = 0
+        self.in_quotes = False
+        self.boundary = 0
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Add a chunk; returns a batch once enough complete rows are buffered"""
+        self.buffer += self.decoder.decode(chunk)
+        self._scan()
+        if len(self.buffer) < self.batch_bytes:
+            return None
+        if self.boundary == 0:
+            if len(self.buffer) > self.max_pending_bytes:
+                self.buffer = ""
+                raise RowBatchOverflow(f"No complete CSV row in {self.max_pending_bytes} bytes")
+            return None
+        batch, self.buffer = self.buffer[:self.boundary], self.buffer[self.boundary:]
+        self.scanned -= self.boundary
+        self.boundary = 0
+        return batch
+
+    def finish(self) -> Optional[str]:
+        """Return whatever is left at the end of the file"""
+        batch = self.buffer + self.decoder.decode(b"", final=True)
+        self.buffer = ""
+        self.scanned = self.boundary = 0
+        return batch if batch.strip() else None
+
+    def _scan(self):
+        """
+        Advance the quote state over the text added since the last call, remembering the last newline
+        outside a quoted field
+        """
+        buffer, position, end = self.buffer, self.scanned, len(self.buffer)
+        while position < end:
+            quote = buffer.find('"', position, end)
+            stop = end if quote == -1 else quote
+            if not self.in_quotes:
+                newline = buffer.rfind("\n", position, stop)
+                if newline != -1:
+                    self.boundary = newline + 1
+            if quote == -1:
+                break
+            if self.in_quotes:
+                self.in_quotes = False
+            # Opens at the start of a field, or right after a closing quote ("" is an escaped quote)
+            elif quote == 0 or buffer[quote - 1] in ',\n\r"':
+                self.in_quotes = True
+            position = quote + 1
+        self.scanned = end
+
+class CSVProfiler:
+    """
+    Incremental profiler for a CSV file fed as raw byte chunks.
+    Call feed() for every chunk and finish() once at the end; finish() returns None if profiling was
+    abandoned because a row never ended (see CSVRowBatcher).
+    """
+
+    def __init__(self, batch_bytes: int = PROFILER_BATCH_BYTES, max_pending_bytes: int = PROFILER_MAX_PENDING_BYTES):
+        self.batcher = CSVRowBatcher(batch_bytes, max_pending_bytes)
+        self.column_names: Optional[List[str]] = None
+        self.columns: List[ColumnProfile] = []
+        self.row_count = 0
+        self.rng = np.random.default_rng()
+        self.failed = False
+
+    def feed(self, chunk: bytes):
+        if self.failed:
+            return
+        try:
+            batch = self.batcher.feed(chunk)
+        except RowBatchOverflow as e:
+            print(f"⚠️ CSV profile abandoned: {e}")
+            self.failed = True
+            return
+        if batch:
+            self._profile_batch(batch)
+
+    def finish(self) -> Optional[dict]:
+        if self.failed:
+            return None
+        batch = self.batcher.finish()
+        if batch:
+            self._profile_batch(batch)
+        return {
+            "row_count": self.row_count,
+            "column_profiles": [column.to_dict() for column in self.columns],
+        }
+
+    def _profile_batch(self, text: str):
+        read_options = {"dtype": str, "keep_default_na": False, "on_bad_lines": "skip"}
+        if self.column_names is None:
+            df = pd.read_csv(StringIO(text), **read_options)
+            self.column_names = df.columns.tolist()
+            self.columns = [ColumnProfile(str(name), self.rng) for name in self.column_names]
+        else:
+            df = pd.read_csv(StringIO(text), header=None, names=self.column_names, **read_options)
+
+        self.row_count += len(df)
+        for column, name in zip(self.columns, self.column_names):
+            column.update(df[name].fillna(""))
+
+def format_csv_profile(csv_info: dict) -> str:
+    """
+    Render the column profiles of a csv_info as compact text for prompts (empty for sessions without a profile)
+    """
+    profiles = csv_info.get("column_profiles")
+    if not profiles:
+        return ""
+
+    lines = [f"Rows: {csv_info.get('row_count')}"]
+    for profile in profiles:
+        line = f"- {profile['name']} ({profile['dtype']}): nulls={profile['null_count']}, ~distinct={profile['distinct_count']}"
+        if "mean" in profile:
+            line += f", min={profile['min']:g}, max={profile['max']:g}, mean={profile['mean']:g}"
+            quantiles = profile.get("quantiles") or {}
+            if quantiles:
+                line += ", ~quartiles=" + "/".join(f"{quantiles[q]:g}" for q in ("p25", "p50", "p75"))
+        elif "min" in profile:
+            line += f", min={profile['min']}, max={profile['max']}"
+        if profile.get("top_values"):
+            line += ", top=" + ", ".join(f"{top['value']!r} (~{top['count']})" for top in profile["top_values"])
+        lines.append(line)
+    return "\n".join(lines)
+
+def describe_dataset(csv_info: dict) -> str:
+    """
+    Columns, preview rows and (when available) the full-file profile of a csv_info, for prompts
+    """
+    description = f"Columns: {csv_info.get('column_names')}\nPreview rows: {csv_info.get('preview_data')}"
+    profile = format_csv_profile(csv_info)
+    if profile:
+        description += f"\nProfile of the full file:\n{profile}"
+    return description
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any
 import uuid
 from app.auth.utils import get_current_user
@@ -11,26 +13,45 @@ from azure.core.exceptions import AzureError
 from azure.storage.blob.aio import BlobServiceClient
 from app.core.config import settings
 from app.db.mongo import log_error
-from app.chat.schemas import UploadCSVResponse, ChatResponse, SmartQuestions
-from app.container.utils import get_all_active_containers, upload_file_to_container
-import base64
-from azure.storage.blob import BlobBlock
+from app.core.tracing import span, current_timings
+from app.core.metrics import UPLOADS_IN_FLIGHT
+from app.chat.schemas import UploadCSVResponse, ChatResponse
+from app.container.utils import get_or_upload_dataset_to_container, dataset_content_key
+from app.container.pool import get_container_pool
+import hashlib
+from bson import ObjectId
 from app.llm.openai_client import get_openai_client
 from openai import OpenAI
-from app.db.blob import get_blob_client
-from app.chat.utils import download_file_from_container
+from app.db.blob import get_blob_client, PipelinedBlockUploader
+from app.chat.profiler import CSVProfiler
+from app.chat.columnar import ParquetBuilder, upload_parquet_copy
+from app.chat.answer_cache import get_cached_answer, store_answer
+from app.sessions.utils import invalidate_session_count
+from app.chat.history import get_conversation_history, update_history_summary
+from app.chat.utils import (
+    download_file_from_container,
+    build_chat_prompt,
+    enrich_code_explanation,
+    generate_smart_questions,
+    smart_questions_stale_before,
+    get_field,
+    format_sse,
+)
 router = APIRouter()
 
 @router.post("/upload_csv", response_model=UploadCSVResponse)
 async def upload_csv_true_streaming(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    use_cache: bool = True,
     current_user: dict = Depends(get_current_user),
     db: Database = Depends(get_db),
     blob_client: BlobServiceClient = Depends(get_blob_client)
 ):
     """
     TRUE STREAMING: Never store the full file in memory!
-    Stream directly to Azure while getting CSV preview from first chunk.
+    Stream directly to Azure while getting CSV preview from first chunk
+    and profiling every chunk (row count, dtypes, nulls, distributions) for csv_info.
     """
     
     # 1. Validate file type
@@ -55,9 +76,12 @@ async def upload_csv_true_streaming(
         )
     
     chunk_size = 64 * 1024  # 64KB chunks
-    azure_block_size = 4 * 1024 * 1024  # 4MB Azure blocks
     
     total_size = 0
+    content_hash = hashlib.sha256()  # Content address of the file, used to reuse uploads across containers
+    csv_profiler = CSVProfiler()  # Full-file profile, built incrementally so the file is never held in memory
+    parquet_builder = ParquetBuilder()  # Columnar copy for the code interpreter, written to a temp file as we go
+    parquet_info = {}
     csv_preview_data = None
     column_names = None
     total_columns = 0
@@ -70,12 +94,11 @@ async def upload_csv_true_streaming(
     blob_name = f"{session_id}_{timestamp}_{file.filename}"
     blob_client_container = blob_service_client.get_container_client(container_name).get_blob_client(blob_name)
     
-    # Azure block upload setup
-    block_list = []
-    current_block_data = bytearray()
-    block_counter = 0
+    # Azure block upload setup (bounded window of concurrently staged blocks)
+    block_uploader = PipelinedBlockUploader(blob_client_container)
     
     print("🚀 TRUE STREAMING: Processing file without storing full content...")
+    UPLOADS_IN_FLIGHT.inc()
     
     try:
         # Create container if needed
@@ -92,7 +115,7 @@ async def upload_csv_true_streaming(
                 break  # End of file
             
             total_size += len(chunk)
-            print(f"📥 Processing chunk: {len(chunk)} bytes (Total processed: {total_size} bytes)")
+            content_hash.update(chunk)
             
             # Size check - early exit if too big
             if total_size >= max_size:
@@ -137,57 +160,50 @@ async def upload_csv_true_streaming(
                     print(f"❌ Error processing CSV preview: {e}")
                     raise HTTPException(status_code=400, detail="Invalid CSV format")
             
-            # ADD CHUNK TO CURRENT AZURE BLOCK
-            current_block_data.extend(chunk)
-            
-            # UPLOAD BLOCK WHEN IT REACHES 4MB OR END OF FILE
-            if len(current_block_data) >= azure_block_size:
-                # Upload this block to Azure immediately
-                block_id = base64.b64encode(f"block-{block_counter:06d}".encode()).decode()
-                
-                print(f"📤 Uploading Azure block {block_counter + 1}: {len(current_block_data)} bytes")
-                
-                await blob_client_container.stage_block(
-                    block_id=block_id,
-                    data=bytes(current_block_data)
-                )
-                
-                block_list.append(BlobBlock(block_id=block_id))
-                block_counter += 1
-                
-                print(f"✅ Block uploaded. Memory freed. Total blocks: {len(block_list)}")
-                
-                # CLEAR BLOCK DATA - FREE MEMORY!
-                current_block_data = bytearray()
-        
-        # Upload final block if there's remaining data
-        if len(current_block_data) > 0:
-            block_id = base64.b64encode(f"block-{block_counter:06d}".encode()).decode()
-            
-            print(f"📤 Uploading final Azure block: {len(current_block_data)} bytes")
-            
-            await blob_client_container.stage_block(
-                block_id=block_id,
-                data=bytes(current_block_data)
-            )
-            
-            block_list.append(BlobBlock(block_id=block_id))
-            print(f"✅ Final block uploaded")
+            # PROFILE EVERY CHUNK (parsing runs off the event loop; best effort, the upload never fails on it)
+            if csv_profiler is not None:
+                with span("profile"):
+                    try:
+                        await asyncio.to_thread(csv_profiler.feed, chunk)
+                    except Exception as e:
+                        await log_error(e, "chat/routes.py", "upload_csv_true_streaming - profile")
+                        csv_profiler = None
+            with span("parquet"):
+                await asyncio.to_thread(parquet_builder.feed, chunk)
+
+            # ADD CHUNK TO THE AZURE UPLOAD (full blocks are staged in the background while we keep reading)
+            with span("blob_upload", bytes=len(chunk)):
+                await block_uploader.write(chunk)
         
-        # Commit all blocks to create final blob
-        print(f"🔗 Committing {len(block_list)} blocks to create final blob...")
+        # Stage the final block, wait for all blocks and commit them in order
+        print(f"🔗 Committing blocks to create final blob...")
         
-        await blob_client_container.commit_block_list(
-            block_list=block_list,
-            content_type="text/csv"
-        )
+        with span("blob_commit"):
+            commit_result = await block_uploader.commit(content_type="text/csv")
         
+        csv_profile = None
+        if csv_profiler is not None:
+            with span("profile"):
+                try:
+                    csv_profile = await asyncio.to_thread(csv_profiler.finish)
+                except Exception as e:
+                    await log_error(e, "chat/routes.py", "upload_csv_true_streaming - profile")
+        if csv_profile:
+            print(f"📊 CSV profiled: {csv_profile['row_count']} rows")
+
+        with span("parquet_upload") as stage:
+            parquet_info = await upload_parquet_copy(
+                parquet_builder, blob_service_client.get_container_client(container_name), blob_name
+            )
+            stage.set(bytes=parquet_info.get("parquet_size", 0))
+
         file_url = blob_client_container.url
+        file_etag = commit_result.get("etag")
+        content_sha256 = content_hash.hexdigest()
         
         print(f"✅ TRUE STREAMING COMPLETE!")
         print(f"📊 Total file size: {total_size} bytes")
-        print(f"📊 Azure blocks created: {len(block_list)}")
-        print(f"💾 Max memory used: ~{azure_block_size//1024//1024}MB (one block)")
+        print(f"📊 Azure blocks created: {len(block_uploader.block_ids)}")
         print(f"🔗 File URL: {file_url}")
         
     except HTTPException:
@@ -195,44 +211,15 @@ async def upload_csv_true_streaming(
     except Exception as e:
         print(f"❌ Error during streaming: {e}")
         raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
+    finally:
+        await block_uploader.abort()
+        parquet_builder.close()
+        UPLOADS_IN_FLIGHT.dec()
     
     # Validate that we got CSV preview
     if csv_preview_data is None:
         raise HTTPException(status_code=400, detail="Could not extract CSV preview")
     
-    # Generate smart questions using OpenAI
-    
-    try:
-        openai_client = await get_openai_client()
-        
-        # Create prompt for smart questions generation
-        smart_questions_prompt = f"""
-        Based on the following CSV file information, generate 5 smart, insightful questions that a business analyst might want to ask about this data:
-
-        File name: {file.filename}
-        Columns: {column_names}
-        Sample data: {csv_preview_data}
-
-        Generate questions that would help uncover business insights, trends, patterns, or actionable information from this dataset. 
-        Make the questions specific to the data structure and content shown.
-        """
-        
-        response = await openai_client.responses.parse(
-            model="gpt-4.1-mini",
-            input=[
-                {"role": "system", "content": "Generate exactly 5 smart business questions about the CSV data based on the provided information."},
-                {"role": "user", "content": smart_questions_prompt}
-            ],
-            text_format=SmartQuestions
-        )
-        
-        smart_questions = response.output_parsed.questions_list
-        print(f"✅ Generated {len(smart_questions)} smart questions")
-        
-    except Exception as e:
-        print(f"⚠️ Error generating smart questions: {e}")
-        smart_questions = []
-    
     # 3. Save session data to MongoDB
     try:
         session_document = {
@@ -245,14 +232,21 @@ async def upload_csv_true_streaming(
                 "container_name": container_name,
                 "file_url": file_url,
                 "file_size": total_size,
-                "content_type": "text/csv"
+                "content_type": "text/csv",
+                "etag": file_etag,
+                "content_sha256": content_sha256,
+                **parquet_info
             },
             "csv_info": {
                 "total_columns": total_columns,
                 "column_names": column_names,
-                "preview_data": csv_preview_data
+                "preview_data": csv_preview_data,
+                #Without a full-file profile the session keeps the preview only
+                **(csv_profile or {})
             },
-            "smart_questions": smart_questions,
+            # Filled in by generate_smart_questions after the upload has returned
+            "smart_questions": [],
+            "smart_questions_status": "pending",
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
             "status": "active"
@@ -265,11 +259,16 @@ async def upload_csv_true_streaming(
             raise Exception("Failed to create session in database")
         
         print(f"✅ MongoDB session created: {session_id}")
+        invalidate_session_count(current_user["email"])
         
     except Exception as e:
         # Clean up blob if database fails
         try:
             await blob_client_container.delete_blob()
+            if parquet_info:
+                await blob_service_client.get_container_client(container_name).get_blob_client(
+                    parquet_info["parquet_blob_name"]
+                ).delete_blob()
             print(f"🗑️ Cleaned up blob after database error")
         except:
             pass
@@ -281,9 +280,10 @@ async def upload_csv_true_streaming(
         )
         raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
     
-    # 4. Return response with smart questions
+    # 4. Generate smart questions off the response path (poll /chat/smart_questions/{session_id} for them)
+    #use_cache=False regenerates them even if this schema was seen before
+    background_tasks.add_task(generate_smart_questions, session_id, use_cache)
 
-    print(f"Smart questions: {smart_questions}")
     response_data = {
         "session_id": session_id,
         "file_url": file_url,
@@ -295,9 +295,13 @@ async def upload_csv_true_streaming(
             "container_name": container_name,
             "file_url": file_url,
             "file_size": total_size,
-            "content_type": "text/csv"
+            "content_type": "text/csv",
+            "etag": file_etag,
+            "content_sha256": content_sha256,
+            **parquet_info
         },
-        "smart_questions": smart_questions,
+        "smart_questions": [],
+        "smart_questions_status": "pending",
         "message": "CSV file uploaded successfully with true streaming",
         "success": True
     }
@@ -308,15 +312,20 @@ async def upload_csv_true_streaming(
 async def chat_response(
     session_id: str,
     user_query: str,
+    background_tasks: BackgroundTasks,
+    use_cache: bool = True,
     current_user: dict = Depends(get_current_user),
     db: Database = Depends(get_db),
-    container_id: str = Depends(get_all_active_containers),
     openai_client: OpenAI = Depends(get_openai_client),
     blob_client: BlobServiceClient = Depends(get_blob_client)
 ):
     """
-    This endpoint is used to get the chat response for the user query
+    This endpoint is used to get the chat response for the user query.
+    The opening question of a session is answered from the answer cache when the same question was asked first
+    on the same data before (use_cache=False to bypass it).
     """
+    container_pool = None
+    container_id = None
     try:
         #Get the session from the database
         #Add a check to see if the session is owned by the user
@@ -333,107 +342,120 @@ async def chat_response(
             "content_type": "text",
             "metadata": {}
         })
-        
-        #From the session get the file_url
-        file_url = session["file_info"]["file_url"]
-
-        #From the session get csv_info
-        csv_info = session["csv_info"]
-
-        #push the file to the container
-        file_url = await upload_file_to_container(container_id, file_url)
-
-        # Get message history for this session
-        message_history = await db["messages"].find(
-            {"session_id": session_id}
-        ).sort("created_at", 1).to_list(length=None)
-
-        # Format message history for the prompt
-        conversation_history = ""
-        for msg in message_history:
-            role = msg["role"]
-            content = msg["content"]
-            conversation_history += f"{role}: {content}\n"
-
-        #Create the prompt
-        prompt = f"""
-        You are a helpful assistant that answers questions about the uploaded CSV file.
-        The file is located here: {file_url}
-        The file has the following columns: {csv_info["column_names"]}
-        Here is a preview of the data: {csv_info["preview_data"]}
-
-        Previous conversation history:
-        {conversation_history}
-
-        Please answer the following user question. Respond directly if you can, and only use Python code or the code interpreter tool if it is necessary to answer the question accurately.
-
-        Current User question: {user_query}
-        """
-
-        # Step 3: Analyze with code interpreter
-        response = await openai_client.responses.create(
-            model="gpt-4.1-mini",
-            tools=[{"type": "code_interpreter", "container": container_id}],
-            tool_choice="auto",
-            input=prompt,
-            timeout=300
-        )
-        print(response)
-
-        # Initialize variables
-        code_explain = None
-        file_url = None
-        code_content = None
 
-        # Step 3.5 Handle charts generated and extract code
-        for output in response.output:
-            # Extract code if available
-            if hasattr(output, 'code') and output.code:
-                code_content = output.code
-
-                #Step 4: Explain what the code is doing for observability
-                code_explain=await openai_client.responses.create(
-                                    model="gpt-4.1-mini",
-                                    input=f"Explain what the following code is doing so that the business user can understand it. Format your explanation as a numbered list where each step starts with 'This code does:' followed by the action. For example: '1. This code does: Loads the data from the CSV file' : {code_content if code_content else None}.If no code is present, just say 'No code was generated'",
-                                    instructions="You are a helpful assistant that can explain code to business users. You should explain the code in a way that is easy to understand.",
-                                    timeout=300
-                                )
-            
-            if hasattr(output, 'content'):
-                for content in output.content:
-                    if hasattr(content, 'annotations'):
-                        for annotation in content.annotations:
-                            if annotation.type == 'container_file_citation':
-                                file_id = annotation.file_id
-                                filename = annotation.filename
-                                #Download the image file and upload it to the blob container
-                                print("I Ran")
-                                file_url = await download_file_from_container(file_id,container_id, blob_client)
-
-                            
-        
-        if code_explain is None:
-            code_explain_text = None
+        chat_model = "gpt-4.1-mini"
+        content_key = dataset_content_key(session["file_info"])
+
+        #Serve repeated questions on the same data without touching the container.
+        #Only the opening question of a session is cached: a follow-up depends on the conversation before it
+        cacheable = use_cache and await db["messages"].find_one(
+            {"session_id": session_id, "role": "assistant"}, projection={"_id": 1}
+        ) is None
+        with span("answer_cache"):
+            cached = await get_cached_answer(content_key, user_query, chat_model) if cacheable else None
+        if cached:
+            response_text = cached["response"]
+            code_content = cached.get("code")
+            code_explain_text = cached.get("code_explanation")
+            file_url = cached.get("file_url")
         else:
-            code_explain_text = code_explain.output_text
+            #From the session get csv_info
+            csv_info = session["csv_info"]
+
+            #Lease a container only when the model actually has to run
+            container_pool = await get_container_pool()
+            container_id = await container_pool.acquire()
+
+            #push the file to the container (reused if this content is already there)
+            file_path = await get_or_upload_dataset_to_container(container_id, session["file_info"])
+
+            # Rolling summary of older turns plus the recent turns that fit the token budget
+            with span("history"):
+                conversation_history = await get_conversation_history(db, session)
+
+            #Create the prompt
+            prompt = build_chat_prompt(file_path, csv_info, conversation_history, user_query)
+
+            # Step 3: Analyze with code interpreter
+            with span("llm_chat", prompt_chars=len(prompt)) as stage:
+                response = await openai_client.responses.create(
+                    model=chat_model,
+                    tools=[{"type": "code_interpreter", "container": container_id}],
+                    tool_choice="auto",
+                    input=prompt,
+                    timeout=300
+                )
+                stage.set_usage(response)
+            print(response)
 
+            # Initialize variables
+            response_text = response.output_text
+            file_url = None
+            code_content = None
+            code_explain_text = None
 
+            # Step 3.5 Handle charts generated and extract code
+            for output in response.output:
+                # Extract code if available
+                if hasattr(output, 'code') and output.code:
+                    code_content = output.code
+                
+                if hasattr(output, 'content'):
+                    for content in output.content:
+                        if hasattr(content, 'annotations'):
+                            for annotation in content.annotations:
+                                if annotation.type == 'container_file_citation':
+                                    file_id = annotation.file_id
+                                    filename = annotation.filename
+                                    #Download the image file and upload it to the blob container
+                                    print("I Ran")
+                                    file_url = await download_file_from_container(file_id,container_id, blob_client)
+
+        if code_explain_text:
+            code_explanation_status = "done"
+        else:
+            code_explanation_status = "pending" if code_content else None
 
         #Insert the assistant response into the database
         result= await db["messages"].insert_one({
             "session_id": session_id,
             "role": "assistant",
-            "content": response.output_text,
+            "content": response_text,
             "created_at": datetime.utcnow(),
             "content_type": "text",
-            "metadata": {"code": code_content, "code_explanation": code_explain_text, "file_url": file_url}
+            "metadata": {
+                "code": code_content,
+                "code_explanation": code_explain_text,
+                "code_explanation_status": code_explanation_status,
+                "file_url": file_url,
+                "cached": bool(cached),
+                "timings": current_timings()
+            }
         })
 
+        if cacheable and not cached:
+            await store_answer(content_key, user_query, chat_model, {
+                "response": response_text,
+                "code": code_content,
+                "code_explanation": None,
+                "file_url": file_url,
+                "message_id": str(result.inserted_id)
+            })
+
+        #Step 4: Explain what the code is doing for observability, after the answer is returned
+        if code_explanation_status == "pending":
+            background_tasks.add_task(enrich_code_explanation, str(result.inserted_id))
+
+        #Fold turns that left the history window into the rolling summary
+        background_tasks.add_task(update_history_summary, session_id)
+
         output_response={
-            "response": response.output_text,
+            "response": response_text,
             "code": code_content,
             "code_explanation": code_explain_text,
+            "code_explanation_status": code_explanation_status,
             "file_url": file_url,
+            "cached": bool(cached),
            "message_id": str(result.inserted_id) 
         }
 
@@ -441,6 +463,251 @@ async def chat_response(
 
     except Exception as e:
         await log_error(e, "chat/routes.py", "chat_response")
+        if container_id:
+            await container_pool.discard_if_gone(container_id, e)
+        raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
+    finally:
+        if container_id:
+            container_pool.release(container_id)
+
+#Event names differ between SDK versions, so accept both spellings
+CODE_DELTA_EVENTS = ("response.code_interpreter_call.code.delta", "response.code_interpreter_call_code.delta")
+ANNOTATION_ADDED_EVENTS = ("response.output_text_annotation.added", "response.output_text.annotation.added")
+
+@router.post("/chat_stream")
+async def chat_response_stream(
+    session_id: str,
+    user_query: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    openai_client: OpenAI = Depends(get_openai_client),
+    blob_client: BlobServiceClient = Depends(get_blob_client)
+):
+    """
+    Streaming variant of /chat. Sends server-sent events as soon as they are produced:
+    - text: a delta of the answer text
+    - code: a delta of the code being run by the code interpreter
+    - chart: a chart was saved to blob storage (carries file_url)
+    - done: the assistant message is stored (same payload as /chat)
+    - code_explanation: explanation of the generated code, sent after done
+    - error: the turn failed
+    """
+    #Check ownership before starting the stream so a bad session still gets a proper 404
+    session = await db["csv_sessions"].find_one({"session_id": session_id, "user_email": current_user["email"]})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found or not owned by the user")
+
+    #Insert the user query into the database
+    await db["messages"].insert_one({
+        "session_id": session_id,
+        "role": "user",
+        "content": user_query,
+        "created_at": datetime.utcnow(),
+        "content_type": "text",
+        "metadata": {}
+    })
+
+    async def event_stream():
+        container_pool = None
+        container_id = None
+        response_text = ""
+        code_content = None
+        file_url = None
+        stored = False
+        try:
+            # The container is leased inside the stream so it is held until the last event is sent
+            container_pool = await get_container_pool()
+            container_id = await container_pool.acquire()
+
+            #push the file to the container (reused if this content is already there)
+            file_path = await get_or_upload_dataset_to_container(container_id, session["file_info"])
+
+            # Rolling summary of older turns plus the recent turns that fit the token budget
+            with span("history"):
+                conversation_history = await get_conversation_history(db, session)
+
+            prompt = build_chat_prompt(file_path, session["csv_info"], conversation_history, user_query)
+
+            # The span covers the whole stream, including the time the client takes to read it
+            with span("llm_chat", prompt_chars=len(prompt)) as stage:
+                stream = await openai_client.responses.create(
+                    model="gpt-4.1-mini",
+                    tools=[{"type": "code_interpreter", "container": container_id}],
+                    tool_choice="auto",
+                    input=prompt,
+                    stream=True,
+                    timeout=300
+                )
+
+                final_response = None
+                async for event in stream:
+                    if event.type == "response.output_text.delta":
+                        response_text += event.delta
+                        yield format_sse("text", {"delta": event.delta})
+
+                    elif event.type in CODE_DELTA_EVENTS:
+                        yield format_sse("code", {"delta": event.delta})
+
+                    elif event.type in ANNOTATION_ADDED_EVENTS:
+                        annotation = event.annotation
+                        if get_field(annotation, "type") == "container_file_citation":
+                            #Download the image file and upload it to the blob container
+                            file_url = await download_file_from_container(get_field(annotation, "file_id"), container_id, blob_client)
+                            if file_url:
+                                yield format_sse("chart", {"file_url": file_url})
+
+                    elif event.type == "response.completed":
+                        final_response = event.response
+                stage.set_usage(final_response)
+
+            if final_response is not None:
+                response_text = final_response.output_text
+                for output in final_response.output:
+                    if hasattr(output, 'code') and output.code:
+                        code_content = output.code
+
+            #Insert the assistant response into the database
+            result = await db["messages"].insert_one({
+                "session_id": session_id,
+                "role": "assistant",
+                "content": response_text,
+                "created_at": datetime.utcnow(),
+                "content_type": "text",
+                "metadata": {
+                    "code": code_content,
+                    "code_explanation": None,
+                    "code_explanation_status": "pending" if code_content else None,
+                    "file_url": file_url,
+                    "timings": current_timings()
+                }
+            })
+            stored = True
+
+            yield format_sse("done", {
+                "response": response_text,
+                "code": code_content,
+                "code_explanation": None,
+                "code_explanation_status": "pending" if code_content else None,
+                "file_url": file_url,
+                "message_id": str(result.inserted_id)
+            })
+
+            #Explain what the code is doing for observability, after the answer is complete
+            if code_content:
+                code_explain_text = await enrich_code_explanation(str(result.inserted_id))
+                if code_explain_text:
+                    yield format_sse("code_explanation", {"code_explanation": code_explain_text})
+
+        except Exception as e:
+            await log_error(e, "chat/routes.py", "chat_response_stream")
+            if container_id:
+                await container_pool.discard_if_gone(container_id, e)
+
+            yield format_sse("error", {"detail": "Something went wrong at our end. Don't worry, we will fix it asap."})
+        finally:
+            #Keep whatever the user already saw, flagged as partial: after an error, and also when the client
+            #disconnected mid-stream (cancellation / GeneratorExit never reach the except above)
+            if response_text and not stored:
+                try:
+                    await asyncio.shield(db["messages"].insert_one({
+                        "session_id": session_id,
+                        "role": "assistant",
+                        "content": response_text,
+                        "created_at": datetime.utcnow(),
+                        "content_type": "text",
+                        "metadata": {"code": code_content, "code_explanation": None, "file_url": file_url, "partial": True}
+                    }))
+                except Exception as e:
+                    await log_error(e, "chat/routes.py", "chat_response_stream - partial message")
+            if container_id:
+                container_pool.release(container_id)
+
+    #Fold turns that left the history window into the rolling summary once the stream is done
+    background_tasks.add_task(update_history_summary, session_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
+@router.get("/code_explanation/{message_id}")
+async def get_code_explanation(
+    message_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """
+    Return the code explanation of an assistant message and whether it is ready yet.
+    A missing or failed explanation is generated in the background, poll until status is "done".
+    """
+    try:
+        message = await db["messages"].find_one({"_id": ObjectId(message_id)}, projection={"session_id": 1, "metadata": 1})
+        if not message:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        #Add a check to see if the session is owned by the user
+        session = await db["csv_sessions"].find_one({"session_id": message["session_id"], "user_email": current_user["email"]})
+        if not session:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        metadata = message.get("metadata", {})
+        code_explain_text = metadata.get("code_explanation")
+        status = metadata.get("code_explanation_status") or ("done" if code_explain_text else None)
+
+        if code_explain_text is None and metadata.get("code") and status != "running":
+            #The claim inside enrich_code_explanation lets only one of concurrent polls do the work
+            background_tasks.add_task(enrich_code_explanation, message_id)
+            status = "pending"
+
+        return {"message_id": message_id, "code_explanation": code_explain_text, "status": status}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await log_error(e, "chat/routes.py", "get_code_explanation")
+        raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
+
+@router.get("/smart_questions/{session_id}")
+async def get_smart_questions(
+    session_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """
+    Return the suggested questions of a session and whether they are ready yet.
+    A failed generation, or one stuck pending/running after a crash, is retried on the next poll.
+    """
+    try:
+        session = await db["csv_sessions"].find_one(
+            {"session_id": session_id, "user_email": current_user["email"]},
+            projection={"smart_questions": 1, "smart_questions_status": 1, "updated_at": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        smart_questions = session.get("smart_questions") or []
+        # Sessions uploaded before questions were generated in the background have no status
+        status = session.get("smart_questions_status") or "done"
+
+        stale = status in ("pending", "running") and (
+            session.get("updated_at") or datetime.min
+        ) < smart_questions_stale_before(datetime.utcnow())
+        if status == "failed" or stale:
+            #The claim inside generate_smart_questions lets only one of concurrent polls do the work
+            retried = await generate_smart_questions(session_id)
+            if retried is not None:
+                smart_questions, status = retried, "done"
+
+        return {"session_id": session_id, "smart_questions": smart_questions, "status": status}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await log_error(e, "chat/routes.py", "get_smart_questions")
         raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
 
 @router.post("/feedback")
@@ -511,12 +778,14 @@ async def chat_summary(
         openai_client = await get_openai_client()
 
         # Get the chat summary using async response
-        response = await openai_client.responses.create(
-            model="gpt-4.1-mini",
-            input=prompt,
-            instructions="You are a helpful assistant that can summarize the chat history for the user. You should summarize the chat history in a way that is easy to understand.",
-            timeout=300
-        )
+        with span("llm_chat_summary", prompt_chars=len(prompt)) as stage:
+            response = await openai_client.responses.create(
+                model="gpt-4.1-mini",
+                input=prompt,
+                instructions="You are a helpful assistant that can summarize the chat history for the user. You should summarize the chat history in a way that is easy to understand.",
+                timeout=300
+            )
+            stage.set_usage(response)
 
         # Create summary document for database
         summary_doc = {
@@ -10,11 +10,18 @@ class FileInfo(BaseModel):
     file_url: str
     file_size: int
     content_type: str = "text/csv"
+    etag: Optional[str] = None
+    content_sha256: Optional[str] = None
+    parquet_blob_name: Optional[str] = None  #Columnar copy of the CSV used by the code interpreter
+    parquet_url: Optional[str] = None
+    parquet_size: Optional[int] = None
 
 class CSVInfo(BaseModel):
     total_columns: int
     column_names: List[str]
     preview_data: List[Dict[str, Any]]
+    row_count: Optional[int] = None
+    column_profiles: Optional[List[Dict[str, Any]]] = None  #Per column dtype, nulls, distinct count and distribution (see chat/profiler.py)
 
 class CSVSession(BaseModel):
     session_id: str
@@ -23,6 +30,7 @@ class CSVSession(BaseModel):
     file_info: FileInfo
     csv_info: CSVInfo
     smart_questions: List[str]
+    smart_questions_status: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     status: str = "active"
@@ -35,6 +43,7 @@ class UploadCSVResponse(BaseModel):
     preview_data: List[Dict[str, Any]]
     file_info: FileInfo
     smart_questions: List[str]
+    smart_questions_status: Optional[str] = None  #"pending" until the background generation patches the session
     message: str
     success: bool
 
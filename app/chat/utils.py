@@ -1,10 +1,17 @@
 import os
-import aiohttp
+import json
 import uuid
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
 from app.core.config import settings
-from app.db.mongo import log_error
+from app.core.http_client import get_http_session
+from app.db.mongo import log_error, get_db
+from app.core.tracing import span
+from app.chat.profiler import format_csv_profile
+from app.chat.schemas import SmartQuestions
+from app.llm.openai_client import get_openai_client
+from app.llm.schema_cache import get_or_create_for_schema
+from bson import ObjectId
 from azure.storage.blob.aio import BlobServiceClient
 
 async def download_file_from_container(file_id: str,container_id: str, blob_service_client: BlobServiceClient) -> Optional[str]:
@@ -29,8 +36,9 @@ async def download_file_from_container(file_id: str,container_id: str, blob_serv
         
         
         # Download from OpenAI and upload to Azure in one shot
-        async with aiohttp.ClientSession() as session:
-            #NOTE: This is not a good practice to download the file in one shot, we should download the file in chunks and upload it to Azure in chunks but since we are just having images which are 0.1 MB we can do this
+        session = await get_http_session()
+        #NOTE: This is not a good practice to download the file in one shot, we should download the file in chunks and upload it to Azure in chunks but since we are just having images which are 0.1 MB we can do this
+        with span("chart_download") as stage:
             async with session.get(download_url, headers=headers) as response:
                 if response.status == 200:
                     # Get blob client
@@ -38,6 +46,7 @@ async def download_file_from_container(file_id: str,container_id: str, blob_serv
                     
                     # Get file content and upload in one shot
                     file_content = await response.read()
+                    stage.set(bytes=len(file_content))
                     await blob_client_container.upload_blob(file_content, overwrite=True)
                     
                     # Return the blob URL
@@ -49,7 +58,7 @@ async def download_file_from_container(file_id: str,container_id: str, blob_serv
                         additional_info={"file_id": file_id, "status_code": response.status}
                     )
                     return None
-                    
+                
     except Exception as e:
         await log_error(
             error=e,
@@ -58,3 +67,199 @@ async def download_file_from_container(file_id: str,container_id: str, blob_serv
         )
         return None
     
+
+def format_conversation_history(message_history: list) -> str:
+    """
+    Format stored messages as "role: content" lines for the chat prompt.
+    """
+    conversation_history = ""
+    for msg in message_history:
+        role = msg["role"]
+        content = msg["content"]
+        conversation_history += f"{role}: {content}\n"
+    return conversation_history
+
+def dataset_load_hint(file_path: str) -> str:
+    """
+    How the generated code should load the dataset (sessions uploaded with a Parquet copy get the columnar file)
+    """
+    if file_path.endswith(".parquet"):
+        return f"a Parquet copy of the uploaded CSV, load it with pd.read_parquet('{file_path}')"
+    return f"load it with pd.read_csv('{file_path}')"
+
+def build_chat_prompt(file_path: str, csv_info: dict, conversation_history: str, user_query: str) -> str:
+    """
+    Build the code interpreter prompt for a chat turn.
+    """
+    return f"""
+        You are a helpful assistant that answers questions about the uploaded CSV file.
+        The file is located here: {file_path} ({dataset_load_hint(file_path)})
+        The file has the following columns: {csv_info["column_names"]}
+        Here is a preview of the data: {csv_info["preview_data"]}
+        Profile of the full file:
+        {format_csv_profile(csv_info)}
+
+        Previous conversation history:
+        {conversation_history}
+
+        Please answer the following user question. Respond directly if you can, and only use Python code or the code interpreter tool if it is necessary to answer the question accurately.
+
+        Current User question: {user_query}
+        """
+
+async def explain_code(openai_client, code_content: str) -> Optional[str]:
+    """
+    Explain generated code to a business user (used for observability in the UI).
+    """
+    with span("llm_code_explanation") as stage:
+        code_explain = await openai_client.responses.create(
+            model="gpt-4.1-mini",
+            input=f"Explain what the following code is doing so that the business user can understand it. Format your explanation as a numbered list where each step starts with 'This code does:' followed by the action. For example: '1. This code does: Loads the data from the CSV file' : {code_content if code_content else None}.If no code is present, just say 'No code was generated'",
+            instructions="You are a helpful assistant that can explain code to business users. You should explain the code in a way that is easy to understand.",
+            timeout=300
+        )
+        stage.set_usage(code_explain)
+    return code_explain.output_text
+
+async def enrich_code_explanation(message_id: str) -> Optional[str]:
+    """
+    Generate metadata.code_explanation for a stored assistant message, at most once per message.
+    Runs as a background task after the answer is returned, or lazily when the UI asks for it.
+
+    The message is claimed by flipping metadata.code_explanation_status to "running", so concurrent
+    callers never pay for a second LLM call. Returns the explanation, or None if another caller owns it
+    or the message has no code.
+    """
+    db = await get_db()
+    messages_collection = db["messages"]
+
+    claimed = await messages_collection.find_one_and_update(
+        {
+            "_id": ObjectId(message_id),
+            "metadata.code": {"$ne": None},
+            "metadata.code_explanation": None,
+            "metadata.code_explanation_status": {"$nin": ["running", "done"]}
+        },
+        {"$set": {"metadata.code_explanation_status": "running"}}
+    )
+    if not claimed:
+        return None
+
+    try:
+        openai_client = await get_openai_client()
+        code_explain_text = await explain_code(openai_client, claimed["metadata"]["code"])
+
+        await messages_collection.update_one(
+            {"_id": claimed["_id"]},
+            {"$set": {
+                "metadata.code_explanation": code_explain_text,
+                "metadata.code_explanation_status": "done"
+            }}
+        )
+        return code_explain_text
+
+    except Exception as e:
+        # Leave it claimable again so a later request can retry
+        await messages_collection.update_one(
+            {"_id": claimed["_id"]},
+            {"$set": {"metadata.code_explanation_status": "failed"}}
+        )
+        await log_error(e, "chat/utils.py", "enrich_code_explanation")
+        return None
+
+def smart_questions_stale_before(now: datetime) -> datetime:
+    """A pending or running generation last touched before this is assumed dead (its process crashed)"""
+    return now - timedelta(seconds=settings.SMART_QUESTIONS_STALE_SECONDS)
+
+async def generate_smart_questions(session_id: str, use_cache: bool = True) -> Optional[List[str]]:
+    """
+    Generate the suggested questions of a freshly uploaded session and patch them onto csv_sessions.
+    Runs as a background task after the upload has returned; the UI polls /chat/smart_questions for them.
+    Questions are reused across uploads with the same schema unless use_cache is False.
+
+    The session is claimed by flipping smart_questions_status to "running" (from "pending", "failed", or a
+    "running" claim older than SMART_QUESTIONS_STALE_SECONDS whose owner died), so the work is done once.
+    Returns the questions, or None if another caller owns it or it failed.
+    """
+    db = await get_db()
+    sessions_collection = db["csv_sessions"]
+
+    now = datetime.utcnow()
+    claimed = await sessions_collection.find_one_and_update(
+        {"session_id": session_id, "$or": [
+            {"smart_questions_status": {"$in": ["pending", "failed"]}},
+            {"smart_questions_status": "running", "updated_at": {"$lt": smart_questions_stale_before(now)}}
+        ]},
+        {"$set": {"smart_questions_status": "running", "updated_at": now}},
+        projection={"file_info.original_filename": 1, "csv_info": 1}
+    )
+    if not claimed:
+        return None
+
+    try:
+        csv_info = claimed["csv_info"]
+
+        async def ask_for_questions():
+            openai_client = await get_openai_client()
+
+            # Create prompt for smart questions generation
+            smart_questions_prompt = f"""
+            Based on the following CSV file information, generate 5 smart, insightful questions that a business analyst might want to ask about this data:
+
+            File name: {claimed["file_info"]["original_filename"]}
+            Columns: {csv_info["column_names"]}
+            Sample data: {csv_info["preview_data"]}
+            Profile of the full file:
+            {format_csv_profile(csv_info)}
+
+            Generate questions that would help uncover business insights, trends, patterns, or actionable information from this dataset. 
+            Make the questions specific to the data structure and content shown.
+            """
+
+            with span("llm_smart_questions") as stage:
+                response = await openai_client.responses.parse(
+                    model="gpt-4.1-mini",
+                    input=[
+                        {"role": "system", "content": "Generate exactly 5 smart business questions about the CSV data based on the provided information."},
+                        {"role": "user", "content": smart_questions_prompt}
+                    ],
+                    text_format=SmartQuestions
+                )
+                stage.set_usage(response)
+            return response.output_parsed.questions_list
+
+        smart_questions = await get_or_create_for_schema("smart_questions", csv_info, ask_for_questions, use_cache=use_cache)
+        print(f"✅ Generated {len(smart_questions)} smart questions for session {session_id}")
+
+        await sessions_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {
+                "smart_questions": smart_questions,
+                "smart_questions_status": "done",
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        return smart_questions
+
+    except Exception as e:
+        # Leave it claimable again so a later poll can retry
+        await sessions_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {"smart_questions_status": "failed", "updated_at": datetime.utcnow()}}
+        )
+        await log_error(e, "chat/utils.py", "generate_smart_questions")
+        return None
+
+def get_field(item: Any, name: str) -> Any:
+    """
+    Read a field from an SDK object or a plain dict (streamed events carry some payloads as raw dicts).
+    """
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Format one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,170 @@
+'''
+Note: Warm pool of OpenAI containers.
+
+Containers die after 20 minutes without use, so instead of listing every container on the account per request
+we keep a few warm ones in memory, lease them out, and track their idle expiry ourselves.
+Mongo is only written when a container changes state (created / expired).
+'''
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.db.mongo import get_db, log_error
+from app.core.tracing import span
+from app.container.schemas import ContainerSchema
+from app.container.utils import create_new_container, invalidate_container_files, is_container_gone
+
+class ContainerPool:
+    """
+    Keeps `size` warm containers, leases them to requests and replaces them before they expire.
+    """
+
+    def __init__(self, size: int, idle_timeout_seconds: int, refresh_margin_seconds: int):
+        self.size = max(1, size)
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        # container_id -> {"last_used_at": monotonic seconds, "leases": active lease count}
+        # Only touched between awaits, so every change to it is atomic on the event loop; the OpenAI and Mongo
+        # calls happen outside of that bookkeeping and never block other acquires
+        self.containers: Dict[str, dict] = {}
+        # Containers being created right now, and the creation acquire() waits on when the pool is empty
+        self._creating = 0
+        self._pending_add: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Start the background refresher, which warms the pool right away. Never waits on OpenAI, so a slow or
+        failing container API cannot keep the process from starting (acquire() creates one on demand).
+        """
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop the background refresher (containers are left to expire on their own)"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def _is_expiring(self, state: dict) -> bool:
+        idle_for = time.monotonic() - state["last_used_at"]
+        return idle_for >= self.idle_timeout_seconds - self.refresh_margin_seconds
+
+    async def acquire(self) -> str:
+        """
+        Lease the least busy live container, creating one if the pool is empty.
+        Every acquire must be paired with a release.
+        """
+        with span("container_acquire"):
+            while True:
+                await self._retire_all(self._take_expiring())
+                if self.containers:
+                    container_id = min(self.containers, key=lambda cid: self.containers[cid]["leases"])
+                    state = self.containers[container_id]
+                    state["leases"] += 1
+                    state["last_used_at"] = time.monotonic()
+                    return container_id
+                # Concurrent acquires on an empty pool share one creation
+                if self._pending_add is None or self._pending_add.done():
+                    self._pending_add = asyncio.create_task(self._add_container())
+                await asyncio.shield(self._pending_add)
+
+    def release(self, container_id: str):
+        """Return a leased container; using it resets its idle clock"""
+        state = self.containers.get(container_id)
+        if state:
+            state["leases"] = max(0, state["leases"] - 1)
+            state["last_used_at"] = time.monotonic()
+
+    async def discard(self, container_id: str):
+        """Drop a container that turned out to be dead (e.g. expired on OpenAI's side)"""
+        if self.containers.pop(container_id, None) is not None:
+            await self._retire(container_id)
+
+    async def discard_if_gone(self, container_id: Optional[str], error: Exception):
+        """discard() the container when error says it no longer exists, so the next acquire gets a live one"""
+        if container_id and is_container_gone(error):
+            print(f"Container pool: {container_id} is gone ({error})")
+            try:
+                await self.discard(container_id)
+            except Exception as e:
+                await log_error(e, "container/pool.py", "discard_if_gone")
+
+    async def _add_container(self) -> str:
+        self._creating += 1
+        try:
+            container_id = await create_new_container()
+        finally:
+            self._creating -= 1
+        self.containers[container_id] = {"last_used_at": time.monotonic(), "leases": 0}
+        print(f"Container pool: created {container_id} ({len(self.containers)}/{self.size})")
+
+        db = await get_db()
+        container_doc = ContainerSchema(container_id=container_id, created_at=datetime.now()).model_dump()
+        await db["containers"].insert_one(container_doc)
+        return container_id
+
+    async def _retire(self, container_id: str):
+        """Record a container that already left the pool as expired and forget its files"""
+        db = await get_db()
+        await db["containers"].update_one(
+            {"container_id": container_id},
+            {"$set": {"status": "expired", "expired_at": datetime.now()}}
+        )
+        # Files uploaded to the container die with it
+        await invalidate_container_files(container_id)
+        print(f"Container pool: retired {container_id}")
+
+    async def _retire_all(self, container_ids: List[str]):
+        if container_ids:
+            await asyncio.gather(*(self._retire(container_id) for container_id in container_ids))
+
+    def _take_expiring(self) -> List[str]:
+        """Remove the idle containers about to expire from the pool and return their ids"""
+        # Containers still leased are in use, so they are not idle
+        expiring = [
+            container_id for container_id, state in self.containers.items()
+            if state["leases"] == 0 and self._is_expiring(state)
+        ]
+        for container_id in expiring:
+            self.containers.pop(container_id)
+        return expiring
+
+    async def _fill(self):
+        await self._retire_all(self._take_expiring())
+        missing = self.size - len(self.containers) - self._creating
+        if missing > 0:
+            await asyncio.gather(*(self._add_container() for _ in range(missing)))
+
+    async def _refresh_loop(self):
+        interval = max(10, self.refresh_margin_seconds // 2)
+        while True:
+            try:
+                await self._fill()
+            except Exception as e:
+                await log_error(e, "container/pool.py", "_refresh_loop")
+            await asyncio.sleep(interval)
+
+#Initialize pool (note: This will be initialized once and reused)
+pool: ContainerPool | None = None
+
+async def get_container_pool() -> ContainerPool:
+    """
+    Get or initialize the container pool.
+    Returns the existing pool if already initialized, otherwise creates a new one that warms up in the background.
+    """
+    global pool
+    if pool is None:
+        new_pool = ContainerPool(
+            size=settings.CONTAINER_POOL_SIZE,
+            idle_timeout_seconds=settings.CONTAINER_IDLE_TIMEOUT_SECONDS,
+            refresh_margin_seconds=settings.CONTAINER_REFRESH_MARGIN_SECONDS,
+        )
+        new_pool.start()
+        pool = new_pool
+    return pool
@@ -8,6 +8,7 @@ class ContainerSchema(BaseModel):
     """
     container_id: str
     created_at: datetime
+    status: str = "running"  #"running" or "expired"
 
 
   
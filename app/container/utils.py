@@ -4,16 +4,23 @@ Note: Here we will having all the utilities for the container , which is a sandb
 import asyncio
 from app.llm.openai_client import get_openai_client
 from app.db.mongo import log_error
-from app.container.schemas import ContainerSchema
 from datetime import datetime
 from app.db.mongo import get_db
 import requests
 import os
 from app.core.config import settings
+from app.core.http_client import get_http_session
 import uuid
 import aiohttp
 import aiofiles
 import tempfile
+from typing import Dict, Optional, Tuple
+from app.core.tracing import span
+
+# (container_id, content_key) -> file path inside the container, mirrored in the "container_files" collection
+container_file_cache: Dict[Tuple[str, str], str] = {}
+# One lock per (container_id, content_key) so concurrent requests upload a dataset only once
+container_file_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
 
 async def create_new_container():
     """
@@ -30,67 +37,72 @@ async def create_new_container():
         await log_error(e, "container/utils.py", "create_new_container")
         raise e
 
-async def get_all_active_containers():
+def is_container_gone(error: Exception) -> bool:
     """
-    This function is used to get all the containers from the openai client
+    True when an OpenAI (or container file upload) error says the container no longer exists,
+    i.e. it expired or was deleted on OpenAI's side
     """
-    try:
-        client = await get_openai_client()
-        db = await get_db()
-        print(f"Database connection established: {db.name}")
-        
-        # For async client, we need to iterate through the paginator
-        containers_paginator = client.containers.list()
-        containers_list = []
-        
-        # Collect all containers from the paginator
-        async for container in containers_paginator:
-            containers_list.append(container)
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    message = str(error).lower()
+    if "container" not in message:
+        return False
+    return status == 404 or "expired" in message or "not found" in message
+
+async def upload_file_to_container(container_id: str, file_url: str) -> str:
+    """
+    Upload file to OpenAI container.
+    Pipes the Azure download straight into the container upload unless CONTAINER_UPLOAD_STREAMING is off,
+    in which case the file is spooled through a temp file first.
+    
+    Args:
+        container_id: OpenAI container ID  
+        file_url: Azure blob URL
         
-        # print(f"Containers: {containers_list}")
+    Returns:
+        str: File path in container
+    """
+    if settings.CONTAINER_UPLOAD_STREAMING:
+        return await upload_file_to_container_streaming(container_id, file_url)
+    return await upload_file_to_container_via_disk(container_id, file_url)
+
+async def upload_file_to_container_streaming(container_id: str, file_url: str) -> str:
+    """
+    Upload file to OpenAI container without touching local disk.
+    The Azure response body is read chunk by chunk only as fast as the multipart POST consumes it,
+    so memory stays at one chunk and the download and upload overlap.
+    
+    Args:
+        container_id: OpenAI container ID  
+        file_url: Azure blob URL
         
-        # Find first active (running) container
-        active_container = None
-        for container in containers_list:
-            print(f"Container {container.id}: {container.status}")
-            if container.status == "running":
-                active_container = container
-                break
-                
-        if active_container is None:
-            # Create a new container
-            container_id = await create_new_container()
-            print(f"Created new container with ID: {container_id}")
-            
-            # Create container document
-            container_doc = ContainerSchema(container_id=container_id, created_at=datetime.now()).model_dump()
-            print(f"Container document to insert: {container_doc}")
-            
-            # Insert into database
-            result = await db["containers"].insert_one(container_doc)
-            print(f"Database insert result: {result.inserted_id}")
-            
-            return container_id
-        else:
-            print(f"Using existing container: {active_container.id}")
-            # Create container document for existing container
-            container_doc = ContainerSchema(container_id=active_container.id, created_at=datetime.now()).model_dump()
-            print(f"Container document to insert: {container_doc}")
-            
-            # Insert into database
-            result = await db["containers"].insert_one(container_doc)
-            print(f"Database insert result: {result.inserted_id}")
-            
-            return active_container.id
-    except Exception as e:
-        print(f"Error in get_all_active_containers: {str(e)}")
-        print(f"Error type: {type(e)}")
-        await log_error(e, "container/utils.py", "get_all_active_containers")
-        raise e
- 
-async def upload_file_to_container(container_id: str, file_url: str) -> str:
+    Returns:
+        str: File path in container
+    """
+    filename = file_url.split('/')[-1]
+    headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"}
+    url = f"https://api.openai.com/v1/containers/{container_id}/files"
+
+    session = await get_http_session()
+    async with session.get(file_url) as azure_response:
+        azure_response.raise_for_status()
+
+        async def stream_blob():
+            # The next chunk is only pulled when the upload has sent the previous one (backpressure)
+            async for chunk in azure_response.content.iter_chunked(64 * 1024):
+                yield chunk
+
+        with aiohttp.MultipartWriter("form-data") as form:
+            part = form.append(stream_blob(), {"Content-Type": "application/octet-stream"})
+            part.set_content_disposition("form-data", name="file", filename=filename)
+
+            async with session.post(url, headers=headers, data=form) as response:
+                response.raise_for_status()
+                result = await response.json()
+                return result['path']
+
+async def upload_file_to_container_via_disk(container_id: str, file_url: str) -> str:
     """
-    Upload file to OpenAI container with streaming (8KB memory max)
+    Upload file to OpenAI container by spooling it through a temp file (8KB memory max)
     
     Args:
         container_id: OpenAI container ID  
@@ -106,45 +118,106 @@ async def upload_file_to_container(container_id: str, file_url: str) -> str:
         temp_fd, temp_file_path = tempfile.mkstemp(suffix='.csv')
         os.close(temp_fd)
         
+        session = await get_http_session()
+
         # Stream Azure → Disk
-        async with aiohttp.ClientSession() as session:
-            async with session.get(file_url) as response:
-                response.raise_for_status()
-                async with aiofiles.open(temp_file_path, 'wb') as temp_file:
-                    async for chunk in response.content.iter_chunked(8192):
-                        await temp_file.write(chunk)
+        async with session.get(file_url) as response:
+            response.raise_for_status()
+            async with aiofiles.open(temp_file_path, 'wb') as temp_file:
+                async for chunk in response.content.iter_chunked(8192):
+                    await temp_file.write(chunk)
         
         # Stream Disk → OpenAI  
         filename = file_url.split('/')[-1]
         headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"}
         url = f"https://api.openai.com/v1/containers/{container_id}/files"
         
-        async with aiohttp.ClientSession() as session:
-            async with aiofiles.open(temp_file_path, 'rb') as fp:
-                form = aiohttp.FormData()
-                form.add_field("file", fp, filename=filename)
-                
-                async with session.post(url, headers=headers, data=form) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return result['path']
+        async with aiofiles.open(temp_file_path, 'rb') as fp:
+            form = aiohttp.FormData()
+            form.add_field("file", fp, filename=filename)
+            
+            async with session.post(url, headers=headers, data=form) as response:
+                response.raise_for_status()
+                result = await response.json()
+                return result['path']
     
     finally:
         # Cleanup
         if temp_file_path and os.path.exists(temp_file_path):
             os.unlink(temp_file_path)
     
-#NOTE: This is just testing code
-if __name__ == "__main__":
-    # Example usage when running the file directly
-    async def main():
-        try:
-            container = await get_all_active_containers()
-            if container:
-                print(f"Found active container or created new container: {container}")
-            else:
-                print("No active containers found")
-        except Exception as e:
-            print(f"Error: {str(e)}")
-    
-    asyncio.run(main())
\ No newline at end of file
+def dataset_content_key(file_info: dict) -> str:
+    """
+    Content address of an uploaded dataset: its sha256 when known, else the blob etag, else the blob URL
+    (blob names are unique per upload, so the URL alone still identifies immutable content)
+    """
+    return file_info.get("content_sha256") or file_info.get("etag") or file_info["file_url"]
+
+async def get_or_upload_file_to_container(container_id: str, file_url: str, content_key: Optional[str] = None) -> str:
+    """
+    Return the container path of a dataset, uploading it only if this container does not have it yet.
+
+    Args:
+        container_id: OpenAI container ID
+        file_url: Azure blob URL
+        content_key: Content address of the dataset (see dataset_content_key), defaults to the blob URL
+
+    Returns:
+        str: File path in container
+    """
+    key = (container_id, content_key or file_url)
+
+    if key in container_file_cache:
+        return container_file_cache[key]
+
+    lock = container_file_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        # Another request may have uploaded it while we waited
+        if key in container_file_cache:
+            return container_file_cache[key]
+
+        db = await get_db()
+        registry_doc = await db["container_files"].find_one(
+            {"container_id": container_id, "content_key": key[1]}
+        )
+        if registry_doc:
+            container_file_cache[key] = registry_doc["file_path"]
+            return registry_doc["file_path"]
+
+        with span("dataset_upload"):
+            file_path = await upload_file_to_container(container_id, file_url)
+
+        await db["container_files"].update_one(
+            {"container_id": container_id, "content_key": key[1]},
+            {"$set": {
+                "file_path": file_path,
+                "file_url": file_url,
+                "created_at": datetime.now()
+            }},
+            upsert=True
+        )
+        container_file_cache[key] = file_path
+        return file_path
+
+async def get_or_upload_dataset_to_container(container_id: str, file_info: dict) -> str:
+    """
+    Return the container path of a session's dataset, preferring its Parquet copy when the upload produced one
+    (smaller to transfer and much faster to load than the CSV).
+    """
+    if file_info.get("parquet_url"):
+        return await get_or_upload_file_to_container(
+            container_id, file_info["parquet_url"], f"{dataset_content_key(file_info)}:parquet"
+        )
+    return await get_or_upload_file_to_container(container_id, file_info["file_url"], dataset_content_key(file_info))
+
+async def invalidate_container_files(container_id: str):
+    """
+    Forget every dataset uploaded to a container (called when the container expires)
+    """
+    for key in [key for key in container_file_cache if key[0] == container_id]:
+        container_file_cache.pop(key, None)
+    for key in [key for key in container_file_locks if key[0] == container_id]:
+        container_file_locks.pop(key, None)
+
+    db = await get_db()
+    await db["container_files"].delete_many({"container_id": container_id})
@@ -18,6 +18,63 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRY_SECONDS: int = 3600  
     REFRESH_TOKEN_EXPIRY_SECONDS: int = 259200 
+
+    # Shared HTTP client settings
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_KEEPALIVE_SECONDS: int = 30
+
+    # Blob upload settings
+    BLOB_BLOCK_SIZE: int = 4 * 1024 * 1024  # Size of each staged Azure block
+    BLOB_UPLOAD_MAX_IN_FLIGHT: int = 3  # Blocks staged concurrently per upload (memory cap ~ (this + 1) blocks)
+
+    # Container pool settings
+    CONTAINER_POOL_SIZE: int = 2  # Warm containers kept ready
+    CONTAINER_IDLE_TIMEOUT_SECONDS: int = 1200  # OpenAI expires containers after 20 minutes idle
+    CONTAINER_REFRESH_MARGIN_SECONDS: int = 120  # Replace containers this long before they expire
+    CONTAINER_UPLOAD_STREAMING: bool = True  # Pipe Azure downloads straight into container uploads (no temp file)
+
+    # Chat history settings
+    CHAT_HISTORY_MAX_MESSAGES: int = 10  # Most recent messages sent verbatim in the prompt
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000  # Token budget for those recent messages
+
+    # Authenticated user cache (saves a users lookup on nearly every request)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 1024
+
+    # Session list
+    SESSION_COUNT_CACHE_TTL_SECONDS: int = 30  # How long a user's session count is reused across pages
+    MESSAGES_PAGE_SIZE: int = 50  # Messages per page of session history
+
+    # Mongo housekeeping
+    ERROR_LOG_TTL_DAYS: int = 30  # error_logs entries are removed after this long
+    ERROR_LOG_FLUSH_SECONDS: float = 2.0  # Queued errors are written (and repeats merged) this often
+    ERROR_LOG_MAX_PENDING: int = 1000  # Distinct errors queued before new ones are dropped
+    CONTAINER_RECORD_TTL_DAYS: int = 7  # containers records are removed after this long
+    MONGO_VERIFY_QUERY_PLANS: bool = True  # Explain hot queries at startup and refuse to start on a COLLSCAN
+
+    # Schema-fingerprint cache for KPI plans and smart questions
+    SCHEMA_CACHE_ENABLED: bool = True
+    SCHEMA_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Exact-match chat answer cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 3600
+    ANSWER_CACHE_LRU_SIZE: int = 512  # Answers kept in process memory
+
+    SMART_QUESTIONS_STALE_SECONDS: int = 300  # Pending/running smart questions untouched this long are generated again
+
+    # Deep analysis settings
+    DEEP_ANALYSIS_KPI_CONCURRENCY: int = 3  # Max KPIs analyzed in parallel per run
+    DEEP_ANALYSIS_SINGLE_PASS: bool = True  # KPI code interpreter call returns the structured analysis itself
+    DEEP_ANALYSIS_MAX_RUNNING_JOBS: int = 4  # Max analyses running at once across all workers
+    DEEP_ANALYSIS_MAX_JOBS_PER_USER: int = 1  # Max analyses running at once per user
+    DEEP_ANALYSIS_JOB_LEASE_SECONDS: int = 120  # A job is retried if its worker stops heartbeating for this long
+    DEEP_ANALYSIS_JOB_MAX_ATTEMPTS: int = 3
+    DEEP_ANALYSIS_WORKER_CONCURRENCY: int = 2  # Jobs run at once per worker process
+    DEEP_ANALYSIS_WORKER_POLL_SECONDS: int = 2
+    DEEP_ANALYSIS_WORKER_METRICS_PORT: int = 9100  # /metrics of a worker process (0 disables it)
+    DEEP_ANALYSIS_EMBEDDED_WORKERS: int = 0  # Job slots run inside each API process (opt-in for single-container dev only)
     model_config = SettingsConfigDict(env_file=Path(__file__).parent.parent.parent / ".env")
 
 settings = Settings()
\ No newline at end of file
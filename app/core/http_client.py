@@ -0,0 +1,39 @@
+'''
+NOTE:
+
+1.This is the shared aiohttp session for all outbound HTTP calls (OpenAI container files, Azure blob downloads).
+2.It needs to be initialized once and reused, so connections are pooled and kept alive instead of
+  paying a new TCP+TLS handshake on every call.
+Refer:
+https://docs.aiohttp.org/en/stable/client_advanced.html#limiting-connection-pool-size
+'''
+import aiohttp
+from app.core.config import settings
+
+#Initialize session (note: This will be initialized once and reused in all functions)
+session: aiohttp.ClientSession | None = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get or initialize the shared HTTP session.
+    Returns the existing session if already initialized, otherwise creates a new one.
+    """
+    global session
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_LIMIT,                        # Max open connections overall
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,      # Max open connections per host
+            keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,     # Keep idle connections for reuse
+            ttl_dns_cache=300                                      # Cache DNS lookups for 5 minutes
+        )
+        session = aiohttp.ClientSession(connector=connector)
+    return session
+
+async def close_http_session():
+    """
+    Close the shared HTTP session and its pooled connections.
+    """
+    global session
+    if session is not None and not session.closed:
+        await session.close()
+    session = None
@@ -0,0 +1,221 @@
+'''
+Note: Prometheus metrics, collected in process and served at /metrics in the text exposition format.
+
+Recording a value is a dict lookup and a few additions, with no I/O and no locks (everything records from
+the event loop). Each API or worker process keeps its own numbers, so scrape every process and sum them in
+Prometheus: the API serves them at /metrics, a deep analysis worker on DEEP_ANALYSIS_WORKER_METRICS_PORT
+(see start_metrics_server).
+
+Most latencies come from the tracing spans (see app/core/tracing.py): every span is observed in
+stage_duration_seconds, and the spans of LLM calls also in llm_request_duration_seconds by call site.
+Mongo command latencies come from a pymongo command listener, and Azure block staging is timed in
+PipelinedBlockUploader. Modules with their own collections.Counter statistics export them with
+register_counter().
+'''
+import bisect
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+THROUGHPUT_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(-2, 9))  # 256KB/s .. 256MB/s
+
+#Every metric defined below, in render order
+registry: List["Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        registry.append(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines of this metric in the text exposition format"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in self.values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in flight while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class CounterSource(Metric):
+    """A collections.Counter owned by another module, read when metrics are rendered"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, counter, labelnames: Sequence[str]):
+        super().__init__(name, help_text, labelnames)
+        self.counter = counter
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, value in list(self.counter.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+def register_counter(name: str, help_text: str, counter, labelnames: Sequence[str]):
+    """Export a module's collections.Counter (keys are label values: a string or a tuple of them)"""
+    CounterSource(name, help_text, counter, labelnames)
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Duration of traced stages (see app/core/tracing.py)", ["stage"])
+STAGE_ERRORS = Counter("stage_errors_total", "Traced stages that raised", ["stage"])
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "OpenAI responses.create / responses.parse latency by call site",
+    ["call_site"], LLM_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "OpenAI tokens used by call site", ["call_site", "kind"])
+CONTAINER_POOL_WAIT_SECONDS = Histogram("container_pool_wait_seconds", "Time to lease a container from the pool")
+BLOB_STAGE_BLOCK_SECONDS = Histogram("blob_stage_block_duration_seconds", "Azure stage_block call latency")
+BLOB_STAGE_BLOCK_THROUGHPUT = Histogram(
+    "blob_stage_block_throughput_bytes_per_second", "Azure stage_block throughput per block", buckets=THROUGHPUT_BUCKETS
+)
+BLOB_STAGED_BYTES = Counter("blob_staged_bytes_total", "Bytes staged to Azure as blocks")
+MONGO_COMMAND_SECONDS = Histogram("mongo_command_duration_seconds", "Mongo command latency", ["command"], MONGO_BUCKETS)
+MONGO_COMMAND_FAILURES = Counter("mongo_command_failures_total", "Mongo commands that failed", ["command"])
+DEEP_ANALYSES_IN_FLIGHT = Gauge("deep_analyses_in_flight", "Deep analysis runs in progress in this process")
+UPLOADS_IN_FLIGHT = Gauge("uploads_in_flight", "CSV uploads being streamed by this process")
+
+# Span name -> call site label of the LLM calls
+LLM_CALL_SITES = {
+    "llm_chat": "chat",
+    "llm_kpi": "kpi",
+    "analysis_parse": "kpi_analysis_parse",
+    "llm_kpi_plan": "kpi_plan",
+    "summary": "summary",
+    "llm_smart_questions": "smart_questions",
+    "llm_code_explanation": "code_explanation",
+    "llm_history_summary": "history_summary",
+    "llm_chat_summary": "chat_summary",
+}
+
+def observe_span(name: str, duration_ms: float, attributes: dict):
+    """Called by tracing for every finished span, inside a trace or not"""
+    seconds = duration_ms / 1000
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if attributes.get("errors"):
+        STAGE_ERRORS.inc(stage=name)
+    if name == "container_acquire":
+        CONTAINER_POOL_WAIT_SECONDS.observe(seconds)
+    call_site = LLM_CALL_SITES.get(name)
+    if call_site:
+        LLM_REQUEST_SECONDS.observe(seconds, call_site=call_site)
+        for kind in ("input_tokens", "output_tokens"):
+            if attributes.get(kind):
+                LLM_TOKENS.inc(attributes[kind], call_site=call_site, kind=kind.split("_")[0])
+
+def observe_stage_block(size: int, seconds: float):
+    BLOB_STAGE_BLOCK_SECONDS.observe(seconds)
+    BLOB_STAGED_BYTES.inc(size)
+    if seconds > 0:
+        BLOB_STAGE_BLOCK_THROUGHPUT.observe(size / seconds)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding mongo_command_duration_seconds"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+async def start_metrics_server(port: int):
+    """
+    Serve /metrics on its own port, for processes that do not run the FastAPI app (the deep analysis worker).
+    Returns the aiohttp runner; call its cleanup() on shutdown.
+    """
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(body=render_metrics().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4"})
+
+    server = web.Application()
+    server.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(server, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    print(f"📈 Metrics served on :{port}/metrics")
+    return runner
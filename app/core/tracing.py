@@ -0,0 +1,143 @@
+'''
+Note: Lightweight per-stage timing.
+
+A Trace collects how long each stage of one unit of work took: an API request (started by
+ServerTimingMiddleware) or a deep analysis run (started by run_deep_analysis_background). The current trace
+lives in a contextvar, so the code doing the work only wraps a stage in `with span("stage_name"):` and tasks
+started from it (asyncio.gather, create_task) record into the same trace.
+
+Spans with the same name are merged: the stage keeps the summed duration, how many times it ran and the sum
+of numeric attributes such as bytes or token counts. Every span also feeds the /metrics histograms
+(app/core/metrics.py), inside a trace or not.
+'''
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from app.core.metrics import observe_span
+
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+class Trace:
+    """
+    Stage timings of one request or job, see span()
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        # stage name -> {"ms": summed duration, "count": runs, **summed numeric attributes}
+        self.stages: Dict[str, dict] = {}
+        self._token = None
+
+    def add(self, name: str, duration_ms: float, **attributes):
+        stage = self.stages.setdefault(name, {"ms": 0.0, "count": 0})
+        stage["ms"] += duration_ms
+        stage["count"] += 1
+        for key, value in attributes.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                if value is not None:
+                    stage[key] = value
+            else:
+                stage[key] = stage.get(key, 0) + value
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def timings(self) -> dict:
+        """Stage timings as stored on Mongo documents (durations rounded to 0.1ms)"""
+        timings = {name: {**stage, "ms": round(stage["ms"], 1)} for name, stage in self.stages.items()}
+        timings["total"] = {"ms": round(self.total_ms(), 1), "count": 1}
+        return timings
+
+    def server_timing(self) -> str:
+        """Value of the Server-Timing response header"""
+        metrics = [f"{name};dur={stage['ms']:.1f}" for name, stage in self.stages.items()]
+        metrics.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(metrics)
+
+    def end(self):
+        """Stop being the current trace (only needed for traces made current with start_trace)"""
+        if self._token is not None:
+            current_trace.reset(self._token)
+            self._token = None
+
+def start_trace() -> Trace:
+    """Start a trace and make it the current one; call trace.end() in the same context when done"""
+    trace = Trace()
+    trace._token = current_trace.set(trace)
+    return trace
+
+def current_timings() -> Optional[dict]:
+    """Timings of the current trace so far, or None outside a trace"""
+    trace = current_trace.get()
+    return trace.timings() if trace is not None else None
+
+class Span:
+    """
+    Times one stage of the current trace, see span()
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.duration_ms = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_usage(self, response):
+        """Record the token usage of an OpenAI Responses API response"""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.set(input_tokens=usage.input_tokens or 0, output_tokens=usage.output_tokens or 0)
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._started_at) * 1000
+        if exc_type is not None:
+            self.attributes["errors"] = 1
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(self.name, self.duration_ms, **self.attributes)
+        observe_span(self.name, self.duration_ms, self.attributes)
+        return False
+
+def span(name: str, **attributes) -> Span:
+    """
+    Time a stage of the current trace:
+
+        with span("llm_chat", prompt_chars=len(prompt)) as stage:
+            response = await openai_client.responses.create(...)
+            stage.set_usage(response)
+    """
+    return Span(name, **attributes)
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that traces every HTTP request and reports the stages finished before the response
+    started in a Server-Timing header (streamed bodies and background tasks are not included).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = start_trace()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            trace.end()
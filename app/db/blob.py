@@ -1,6 +1,12 @@
+import asyncio
+import base64
+import time
+from typing import List, Optional
+from azure.storage.blob import BlobBlock
 from azure.storage.blob.aio import BlobServiceClient
 from app.core.config import settings
 from app.db.mongo import log_error
+from app.core.metrics import observe_stage_block
 from fastapi import HTTPException
 
 blob_client = None
@@ -18,3 +24,69 @@ async def get_blob_client():
             additional_info={"action": "get_blob_client"}
         )
         return HTTPException(status_code=500, detail="Failed to get blob client")
+
+class PipelinedBlockUploader:
+    """
+    Upload a blob as a sequence of staged blocks while the caller keeps producing data.
+
+    write() buffers data into blocks of block_size and stages full blocks in the background, with at most
+    max_in_flight stage_block calls running at once (write() waits when the window is full), so memory stays
+    under about (max_in_flight + 1) blocks. commit() stages the last block, waits for the rest and commits
+    the block list in write order.
+    """
+
+    def __init__(self, blob_client, block_size: Optional[int] = None, max_in_flight: Optional[int] = None):
+        self.blob_client = blob_client
+        self.block_size = block_size or settings.BLOB_BLOCK_SIZE
+        self.window = asyncio.Semaphore(max_in_flight or settings.BLOB_UPLOAD_MAX_IN_FLIGHT)
+        self.buffer = bytearray()
+        self.block_ids: List[str] = []
+        self.tasks: List[asyncio.Task] = []
+        self.total_size = 0
+
+    async def write(self, data: bytes):
+        """Add data, staging every block that fills up"""
+        self.buffer.extend(data)
+        self.total_size += len(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            await self._stage(block)
+
+    async def commit(self, **commit_kwargs) -> dict:
+        """Stage the remaining data, wait for every block and commit them in order"""
+        if self.buffer:
+            await self._stage(bytes(self.buffer))
+            self.buffer = bytearray()
+        await asyncio.gather(*self.tasks)
+        return await self.blob_client.commit_block_list(
+            block_list=[BlobBlock(block_id=block_id) for block_id in self.block_ids],
+            **commit_kwargs
+        )
+
+    async def abort(self):
+        """Cancel blocks still being staged (uncommitted blocks are garbage collected by Azure)"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.buffer = bytearray()
+
+    async def _stage(self, block: bytes):
+        # Surface failures of earlier blocks before doing more work
+        for task in self.tasks:
+            if task.done() and not task.cancelled() and task.exception():
+                raise task.exception()
+
+        await self.window.acquire()
+        block_id = base64.b64encode(f"block-{len(self.block_ids):06d}".encode()).decode()
+        self.block_ids.append(block_id)
+        self.tasks.append(asyncio.create_task(self._stage_block(len(self.block_ids), block_id, block)))
+
+    async def _stage_block(self, block_number: int, block_id: str, block: bytes):
+        try:
+            print(f"📤 Staging Azure block {block_number}: {len(block)} bytes")
+            started_at = time.perf_counter()
+            await self.blob_client.stage_block(block_id=block_id, data=block)
+            observe_stage_block(len(block), time.perf_counter() - started_at)
+        finally:
+            self.window.release()
@@ -0,0 +1,143 @@
+'''
+Note: Index bootstrap and query-plan check for every Mongo collection.
+
+INDEX_SPECS declares the indexes each collection needs; ensure_indexes() creates them at startup (creating an
+index that already exists is a no-op). HOT_QUERIES lists the queries the API runs on every request;
+verify_query_plans() explains each of them and raises if any would scan a whole collection (COLLSCAN), so a
+missing or changed index fails the deploy instead of slowly degrading every request.
+'''
+from datetime import datetime
+from typing import Dict, List
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.core.config import settings
+from app.db.mongo import get_db
+
+DAY_SECONDS = 24 * 3600
+
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "csv_sessions": [
+        IndexModel([("session_id", ASCENDING), ("user_email", ASCENDING)], name="session_id_user_email"),
+        # Session list keyset: (created_at, _id) newest first
+        IndexModel(
+            [("user_email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_email_created_at_id"
+        ),
+    ],
+    "messages": [
+        # Message history keyset: (created_at, _id) in both directions
+        IndexModel(
+            [("session_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="session_id_created_at_id"
+        ),
+    ],
+    "deep_analysis": [
+        IndexModel([("session_id", ASCENDING), ("created_at", DESCENDING)], name="session_id_created_at"),
+    ],
+    "deep_analysis_jobs": [
+        IndexModel([("session_id", ASCENDING), ("created_at", DESCENDING)], name="session_id_created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+    ],
+    "containers": [
+        IndexModel([("container_id", ASCENDING)], name="container_id"),
+        # Container records are only useful while the container can still be alive
+        IndexModel(
+            [("created_at", ASCENDING)], name="created_at_ttl",
+            expireAfterSeconds=settings.CONTAINER_RECORD_TTL_DAYS * DAY_SECONDS
+        ),
+    ],
+    "container_files": [
+        IndexModel([("container_id", ASCENDING), ("content_key", ASCENDING)], name="container_id_content_key", unique=True),
+    ],
+    "schema_cache": [
+        IndexModel([("kind", ASCENDING), ("fingerprint", ASCENDING)], name="kind_fingerprint", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "answer_cache": [
+        IndexModel([("key", ASCENDING)], name="key", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "error_logs": [
+        IndexModel(
+            [("timestamp", ASCENDING)], name="timestamp_ttl",
+            expireAfterSeconds=settings.ERROR_LOG_TTL_DAYS * DAY_SECONDS
+        ),
+    ],
+}
+
+# name -> (collection, filter, sort) for the queries that run on every request.
+# Values are placeholders, only the shape of the query matters to the planner.
+HOT_QUERIES = {
+    "user by email": ("users", {"email": "user@example.com"}, None),
+    "session of user": ("csv_sessions", {"session_id": "session", "user_email": "user@example.com"}, None),
+    "session by id": ("csv_sessions", {"session_id": "session"}, None),
+    "sessions of user, newest first": (
+        "csv_sessions", {"user_email": "user@example.com"}, [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ),
+    "sessions of user after cursor": (
+        "csv_sessions",
+        {"user_email": "user@example.com", "$or": [
+            {"created_at": {"$lt": datetime(2000, 1, 1)}},
+            {"created_at": datetime(2000, 1, 1), "_id": {"$lt": ObjectId("000000000000000000000000")}}
+        ]},
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ),
+    "messages of session": ("messages", {"session_id": "session"}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+    "messages of session after message": (
+        "messages",
+        {"session_id": "session", "$or": [
+            {"created_at": {"$gt": datetime(2000, 1, 1)}},
+            {"created_at": datetime(2000, 1, 1), "_id": {"$gt": ObjectId("000000000000000000000000")}}
+        ]},
+        [("created_at", ASCENDING), ("_id", ASCENDING)]
+    ),
+    "recent messages of session": ("messages", {"session_id": "session"}, [("created_at", DESCENDING)]),
+    "latest deep analysis of session": ("deep_analysis", {"session_id": "session"}, [("created_at", DESCENDING)]),
+    "active job of session": ("deep_analysis_jobs", {"session_id": "session", "status": "queued"}, [("created_at", DESCENDING)]),
+    "running jobs": ("deep_analysis_jobs", {"status": "running", "lease_expires_at": {"$gt": datetime(2000, 1, 1)}}, None),
+    "dataset in container": ("container_files", {"container_id": "container", "content_key": "key"}, None),
+    "schema cache entry": ("schema_cache", {"kind": "kpi_list", "fingerprint": "fingerprint"}, None),
+    "answer cache entry": ("answer_cache", {"key": "key"}, None),
+}
+
+async def ensure_indexes():
+    """
+    Create every index in INDEX_SPECS. Raises if an existing index conflicts with its spec.
+    """
+    db = await get_db()
+    for collection_name, indexes in INDEX_SPECS.items():
+        created = await db[collection_name].create_indexes(indexes)
+        print(f"Mongo indexes ready on {collection_name}: {', '.join(created)}")
+
+def _plan_stages(plan: dict) -> List[str]:
+    """All stage names of an explain() plan tree"""
+    stages = [plan.get("stage")]
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            stages += _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [stage for stage in stages if stage]
+
+async def verify_query_plans():
+    """
+    Explain every query in HOT_QUERIES and raise RuntimeError if any of them plans a COLLSCAN.
+    """
+    db = await get_db()
+    collection_scans = []
+    for name, (collection_name, query_filter, sort) in HOT_QUERIES.items():
+        cursor = db[collection_name].find(query_filter).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        print(f"Query plan for {name}: {' <- '.join(stages)}")
+        if "COLLSCAN" in stages:
+            collection_scans.append(f"{name} ({collection_name} {query_filter})")
+
+    if collection_scans:
+        raise RuntimeError(f"Hot queries are scanning whole collections: {'; '.join(collection_scans)}")
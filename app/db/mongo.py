@@ -11,7 +11,11 @@ https://pymongo.readthedocs.io/en/4.13.0/async-tutorial.html
 from pymongo import AsyncMongoClient
 from app.core.config import settings
 from datetime import datetime
+from collections import Counter
+from typing import Dict, Optional, Tuple
+import asyncio
 import traceback
+from app.core.metrics import MongoCommandMetrics, register_counter
 
 #Initialize client and db (note:These will be initialized once and reused in all functions or routes)
 client: AsyncMongoClient | None = None
@@ -30,7 +34,8 @@ async def get_client():
                 serverSelectionTimeoutMS=5000,    # 5 second timeout
                 connectTimeoutMS=5000,            # 5 second connect timeout
                 maxPoolSize=50,                   # Max 50 connections
-                retryWrites=True                  # Retry failed writes
+                retryWrites=True,                 # Retry failed writes
+                event_listeners=[MongoCommandMetrics()]  # Command latencies for /metrics
             )
         return client
     except Exception as e:
@@ -55,15 +60,141 @@ async def get_db():
         print(f"Traceback: {traceback.format_exc()}")
         raise
 
+# "queued" | "deduplicated" | "dropped" | "written" | "flush_failed" -> count
+ERROR_SINK_STATS: Counter = Counter()
+register_counter("error_log_events_total", "Errors handled by the error log sink by outcome", ERROR_SINK_STATS, ["outcome"])
+
+class ErrorSink:
+    """
+    Buffers error_logs documents in memory and writes them with one insert_many every flush_seconds.
+    Errors with the same (location, error_type, additional_info) within one flush window become a single
+    document with a count, first_seen and last_seen. Once max_pending distinct errors are waiting, new ones are dropped
+    and only counted (the count is written with the next flush).
+    """
+
+    def __init__(self, flush_seconds: float, max_pending: int):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max(1, max_pending)
+        # (location, error_type, repr of additional_info) -> error document, in arrival order
+        self.pending: Dict[Tuple[str, str, str], dict] = {}
+        self.dropped = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def add(self, error: Exception, location: str, additional_info: dict = None):
+        """Queue an error; never blocks and never raises"""
+        now = datetime.utcnow()
+        # additional_info is part of the key: callers often pass the file as location and the function in it
+        key = (location, type(error).__name__, repr(additional_info))
+        error_doc = self.pending.get(key)
+        if error_doc is not None:
+            error_doc["count"] += 1
+            error_doc["last_seen"] = now
+            ERROR_SINK_STATS["deduplicated"] += 1
+            return
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            ERROR_SINK_STATS["dropped"] += 1
+            return
+        self.pending[key] = {
+            "timestamp": now,
+            "error_type": key[1],
+            "error_message": str(error),
+            "location": location,
+            "traceback": traceback.format_exc(),
+            "additional_info": additional_info or {},
+            "count": 1,
+            "first_seen": now,
+            "last_seen": now
+        }
+        ERROR_SINK_STATS["queued"] += 1
+
+    async def flush(self):
+        """Write everything queued so far"""
+        error_docs = list(self.pending.values())
+        self.pending = {}
+        if self.dropped:
+            now = datetime.utcnow()
+            error_docs.append({
+                "timestamp": now,
+                "error_type": "ErrorLogOverflow",
+                "error_message": f"{self.dropped} errors were dropped because the error log queue was full",
+                "location": "db/mongo.py",
+                "traceback": None,
+                "additional_info": {"max_pending": self.max_pending},
+                "count": self.dropped,
+                "first_seen": now,
+                "last_seen": now
+            })
+            self.dropped = 0
+        if not error_docs:
+            return
+        try:
+            db = await get_db()
+            await db["error_logs"].insert_many(error_docs, ordered=False)
+            ERROR_SINK_STATS["written"] += len(error_docs)
+        except Exception as e:
+            # If error logging fails, print to console as fallback
+            ERROR_SINK_STATS["flush_failed"] += len(error_docs)
+            print(f"Failed to log {len(error_docs)} errors to MongoDB: {str(e)}")
+            for error_doc in error_docs:
+                print(f"Original error: {error_doc['error_type']}: {error_doc['error_message']} at {error_doc['location']} (x{error_doc['count']})")
+
+    def start(self):
+        """Start the periodic flush"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the periodic flush and write what is still queued"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+#Initialize error sink (note: Started by the API and worker processes, see start_error_sink)
+error_sink: ErrorSink | None = None
+
+def start_error_sink() -> ErrorSink:
+    """
+    Start batching error logs in this process.
+    Until it is started (scripts, tests) log_error writes every error directly.
+    """
+    global error_sink
+    if error_sink is None:
+        error_sink = ErrorSink(settings.ERROR_LOG_FLUSH_SECONDS, settings.ERROR_LOG_MAX_PENDING)
+        error_sink.start()
+    return error_sink
+
+async def stop_error_sink():
+    """Flush the remaining errors and go back to writing them directly"""
+    global error_sink
+    if error_sink is not None:
+        sink, error_sink = error_sink, None
+        await sink.stop()
+
 async def log_error(error: Exception, location: str, additional_info: dict = None):
     """
     Log an error to the MongoDB database.
+    With the error sink running this only queues the error, the sink writes it in the background.
     
     Args:
         error: The exception that occurred
         location: Where the error occurred (e.g., function name, route)
         additional_info: Any additional information to log (optional)
     """
+    if error_sink is not None:
+        error_sink.add(error, location, additional_info)
+        return
+
     try:
         db = await get_db()
         error_collection = db["error_logs"]
@@ -0,0 +1,167 @@
+'''
+Note: Durable job queue for deep analysis, backed by the "deep_analysis_jobs" collection.
+
+The API only enqueues; worker processes (app/deep_analysis/worker.py) lease jobs, heartbeat while they run them
+and write progress to the existing deep_analysis document. A job whose lease runs out (worker crashed or restarted)
+becomes leasable again until it runs out of attempts.
+'''
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.db.mongo import get_db
+
+#Job statuses
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+async def enqueue_deep_analysis(session_id: str, current_user: dict, resume: bool = False, use_cache: bool = True) -> str:
+    """
+    Queue a deep analysis run for a session and return the job id.
+    With resume=True the run continues from the session's latest deep_analysis document.
+    With use_cache=False the run skips the schema cache for its KPI plan.
+    """
+    db = await get_db()
+    now = datetime.utcnow()
+    job_doc = {
+        "session_id": session_id,
+        "user_email": current_user["email"],
+        "user": {"email": current_user["email"], "id": str(current_user["_id"])},
+        "status": JOB_QUEUED,
+        "resume": resume,
+        "use_cache": use_cache,
+        "attempts": 0,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "heartbeat_at": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    result = await db["deep_analysis_jobs"].insert_one(job_doc)
+    return str(result.inserted_id)
+
+async def get_active_job(session_id: str) -> Optional[dict]:
+    """
+    Return the queued or running job of a session, if any.
+    A running job whose lease expired still counts while it has attempts left: a worker will lease it again
+    and resume it, so starting another run would have two of them writing the same deep_analysis document.
+    """
+    db = await get_db()
+    return await db["deep_analysis_jobs"].find_one(
+        {
+            "session_id": session_id,
+            "$or": [
+                {"status": JOB_QUEUED},
+                {"status": JOB_RUNNING, "lease_expires_at": {"$gt": datetime.utcnow()}},
+                {"status": JOB_RUNNING, "attempts": {"$lt": settings.DEEP_ANALYSIS_JOB_MAX_ATTEMPTS}}
+            ]
+        },
+        sort=[("created_at", -1)]
+    )
+
+async def lease_next_job(worker_id: str) -> Optional[dict]:
+    """
+    Lease the oldest runnable job for this worker, respecting the global and per-user concurrency limits.
+    Runnable means queued, or running with an expired lease (its worker died).
+
+    The limits are checked just before the atomic lease, so under heavy contention they can be exceeded
+    by at most the number of workers polling at the same moment.
+    """
+    db = await get_db()
+    jobs_collection = db["deep_analysis_jobs"]
+    now = datetime.utcnow()
+
+    running_filter = {"status": JOB_RUNNING, "lease_expires_at": {"$gt": now}}
+    if await jobs_collection.count_documents(running_filter) >= settings.DEEP_ANALYSIS_MAX_RUNNING_JOBS:
+        return None
+
+    busy_users = [
+        group["_id"] async for group in await jobs_collection.aggregate([
+            {"$match": running_filter},
+            {"$group": {"_id": "$user_email", "running": {"$sum": 1}}},
+            {"$match": {"running": {"$gte": settings.DEEP_ANALYSIS_MAX_JOBS_PER_USER}}}
+        ])
+    ]
+
+    return await jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": JOB_QUEUED},
+                {"status": JOB_RUNNING, "lease_expires_at": {"$lte": now}}
+            ],
+            "attempts": {"$lt": settings.DEEP_ANALYSIS_JOB_MAX_ATTEMPTS},
+            "user_email": {"$nin": busy_users}
+        },
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=settings.DEEP_ANALYSIS_JOB_LEASE_SECONDS),
+                "heartbeat_at": now,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def heartbeat_job(job_id, worker_id: str) -> bool:
+    """
+    Extend the lease of a running job. Returns False if the job was taken over by another worker.
+    """
+    db = await get_db()
+    now = datetime.utcnow()
+    result = await db["deep_analysis_jobs"].update_one(
+        {"_id": job_id, "lease_owner": worker_id, "status": JOB_RUNNING},
+        {"$set": {
+            "lease_expires_at": now + timedelta(seconds=settings.DEEP_ANALYSIS_JOB_LEASE_SECONDS),
+            "heartbeat_at": now,
+            "updated_at": now
+        }}
+    )
+    return result.matched_count == 1
+
+async def finish_job(job_id, worker_id: str, status: str, error: Optional[str] = None):
+    """
+    Mark a leased job as done or failed
+    """
+    db = await get_db()
+    await db["deep_analysis_jobs"].update_one(
+        {"_id": job_id, "lease_owner": worker_id},
+        {"$set": {
+            "status": status,
+            "error": error,
+            "lease_expires_at": None,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+
+async def fail_exhausted_jobs():
+    """
+    Give up on stuck jobs that have used all their attempts and surface the failure on the deep_analysis document
+    """
+    db = await get_db()
+    now = datetime.utcnow()
+    exhausted_filter = {
+        "status": JOB_RUNNING,
+        "lease_expires_at": {"$lte": now},
+        "attempts": {"$gte": settings.DEEP_ANALYSIS_JOB_MAX_ATTEMPTS}
+    }
+    async for job in db["deep_analysis_jobs"].find(exhausted_filter, projection={"session_id": 1}):
+        await db["deep_analysis_jobs"].update_one(
+            {"_id": job["_id"], "status": JOB_RUNNING},
+            {"$set": {"status": JOB_FAILED, "error": "Worker lease expired too many times", "updated_at": now}}
+        )
+        await db["deep_analysis"].update_one(
+            {"session_id": job["session_id"]},
+            {"$set": {
+                "status": "Deep Analysis Failed",
+                "error": "Deep analysis was interrupted too many times",
+                "updated_at": datetime.now()
+            }},
+            sort={"created_at": -1}
+        )
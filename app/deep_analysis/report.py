@@ -1,10 +1,10 @@
 from datetime import datetime
-import base64
 import re
 from typing import Dict, Any, List
 from azure.storage.blob.aio import BlobServiceClient
 from app.db.mongo import log_error, get_db
-from azure.storage.blob import BlobBlock
+from app.db.blob import PipelinedBlockUploader
+from app.core.tracing import span
 from pymongo.database import Database
 
 async def create_html_report(session_id: str) -> str:
@@ -1276,12 +1276,6 @@ async def upload_report_to_blob(html_content: str, blob_client: BlobServiceClien
         blob_name = f"reports/{session_id}/analysis_report_{timestamp}.html"
         blob_client_container = blob_client.get_container_client(container_name).get_blob_client(blob_name)
         
-        # Azure block upload setup
-        block_list = []
-        current_block_data = bytearray()
-        block_counter = 0
-        azure_block_size = 4 * 1024 * 1024  # 4MB Azure blocks
-        
         # Convert HTML content to bytes
         content_bytes = html_content.encode('utf-8')
         total_size = len(content_bytes)
@@ -1294,44 +1288,20 @@ async def upload_report_to_blob(html_content: str, blob_client: BlobServiceClien
         except:
             pass
         
-        # Process content in chunks
-        for i in range(0, total_size, azure_block_size):
-            chunk = content_bytes[i:i + azure_block_size]
-            current_block_data.extend(chunk)
-            
-            # Upload block when it reaches 4MB or is the last chunk
-            if len(current_block_data) >= azure_block_size or i + azure_block_size >= total_size:
-                block_id = base64.b64encode(f"block-{block_counter:06d}".encode()).decode()
-                
-                print(f"📤 Uploading Azure block {block_counter + 1}: {len(current_block_data)} bytes")
-                
-                await blob_client_container.stage_block(
-                    block_id=block_id,
-                    data=bytes(current_block_data)
-                )
-                
-                block_list.append(BlobBlock(block_id=block_id))
-                block_counter += 1
-                
-                print(f"✅ Block uploaded. Memory freed. Total blocks: {len(block_list)}")
-                
-                # Clear block data - free memory!
-                current_block_data = bytearray()
-        
-        # Commit all blocks to create final blob
-        print(f"🔗 Committing {len(block_list)} blocks to create final blob...")
-        
-        await blob_client_container.commit_block_list(
-            block_list=block_list,
-            content_type="text/html"
-        )
+        # Stage the report in blocks, a few at a time, and commit them in order
+        block_uploader = PipelinedBlockUploader(blob_client_container)
+        try:
+            with span("report_upload", bytes=total_size):
+                await block_uploader.write(content_bytes)
+                await block_uploader.commit(content_type="text/html")
+        finally:
+            await block_uploader.abort()
         
         file_url = blob_client_container.url
         
         print(f"✅ TRUE STREAMING COMPLETE!")
         print(f"📊 Total file size: {total_size} bytes")
-        print(f"📊 Azure blocks created: {len(block_list)}")
-        print(f"💾 Max memory used: ~{azure_block_size//1024//1024}MB (one block)")
+        print(f"📊 Azure blocks created: {len(block_uploader.block_ids)}")
         print(f"🔗 File URL: {file_url}")
         
         return file_url
@@ -1,5 +1,7 @@
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
+import time
 import uuid
 from app.auth.utils import get_current_user
 from app.db.mongo import get_db
@@ -12,25 +14,31 @@ from azure.storage.blob.aio import BlobServiceClient
 from app.core.config import settings
 from app.db.mongo import log_error
 from app.chat.schemas import UploadCSVResponse, ChatResponse, SmartQuestions
-from app.container.utils import get_all_active_containers, upload_file_to_container, create_new_container
+from app.container.utils import get_or_upload_dataset_to_container
+from app.container.pool import get_container_pool
 import base64
 from azure.storage.blob import BlobBlock
 from app.llm.openai_client import get_openai_client
 from openai import OpenAI
 from app.db.blob import get_blob_client
-from app.chat.utils import download_file_from_container
+from app.chat.utils import download_file_from_container, dataset_load_hint
+from app.chat.profiler import describe_dataset
 from app.deep_analysis.prompts import MANAGER_PROMPT
 from app.deep_analysis.schemas import KPIList, KPIAnalysis
 from app.deep_analysis.report import create_html_report, upload_report_to_blob
-from fastapi import BackgroundTasks
 from app.deep_analysis.utils import extract_file_id_from_response
+from app.deep_analysis.jobs import enqueue_deep_analysis, get_active_job
+from app.llm.schema_cache import get_or_create_for_schema
+from app.core.tracing import span, start_trace
+from app.core.metrics import DEEP_ANALYSES_IN_FLIGHT
 
 router = APIRouter()
 
 @router.post("/start")
 async def start_deep_analysis(
     session_id: str,
-    background_tasks: BackgroundTasks,
+    resume: bool = False,
+    use_cache: bool = True,
     db: Database = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
@@ -40,25 +48,231 @@ async def start_deep_analysis(
         if not session_doc:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # ✅ RESET ANY EXISTING ANALYSIS
-        await db["deep_analysis"].delete_many({"session_id": session_id})
+        # Don't start a second run while one is queued or running
+        active_job = await get_active_job(session_id)
+        if active_job:
+            return {"message": "Deep analysis already in progress", "session_id": session_id, "job_id": str(active_job["_id"])}
+
+        if resume:
+            # Keep the previous run so only its failed or missing stages are redone
+            previous_run = await db["deep_analysis"].find_one(
+                {"session_id": session_id},
+                projection={"status": 1},
+                sort=[("created_at", -1)]
+            )
+            if previous_run and previous_run.get("status") == "Deep Analysis Complete":
+                return {"message": "Deep analysis already complete", "session_id": session_id}
+            resume = previous_run is not None
+
+        if not resume:
+            # ✅ RESET ANY EXISTING ANALYSIS
+            await db["deep_analysis"].delete_many({"session_id": session_id})
         
-        # Start background task
-        background_tasks.add_task(run_deep_analysis_background, session_id, current_user)
+        # Queue the job, a deep analysis worker picks it up
+        job_id = await enqueue_deep_analysis(session_id, current_user, resume=resume, use_cache=use_cache)
         
-        return {"message": "Deep analysis started", "session_id": session_id}
+        return {"message": "Deep analysis started", "session_id": session_id, "job_id": job_id}
     
     except Exception as e:
         await log_error(e, "deep_analysis/routes.py", "start_deep_analysis")
         raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
 
 
-async def run_deep_analysis_background(session_id: str, current_user: dict):
-    """Background function - no Depends() needed"""
+async def analyze_kpi(
+    kpi: str,
+    session_id: str,
+    container_id: str,
+    file_path: str,
+    csv_info: dict,
+    openai_client: OpenAI,
+    blob_client: BlobServiceClient,
+    deep_analysis_collection,
+    claimed_chart_ids: Optional[Set[str]] = None,
+):
+    """
+    Analyze a single KPI inside the container and record the outcome on the deep analysis document.
+    Failures are recorded in kpi_status and never raised, so one bad KPI does not stop the others.
+    KPIs sharing the container pass the same claimed_chart_ids so none of them picks up another's chart.
+    """
+    try:
+        print(f"Analyzing KPI: {kpi}")
+
+        #Generate prompt for the kpi with explicit chart creation instruction
+        prompt_kpi = f"""
+        You are a data analyst tasked with analyzing a specific KPI from a dataset.
+
+        Your task:
+        1. Analyze the KPI: {kpi}
+        2. Use the dataset located at: {file_path} ({dataset_load_hint(file_path)})
+        3. Dataset information:
+        {describe_dataset(csv_info)}
+
+        Instructions:
+        - Provide detailed insights about this KPI
+        - ALWAYS create and save a visualization chart for this KPI using matplotlib or seaborn
+        - Make sure to use plt.show() to display and save the chart
+        - Explain your findings in business terms
+        - The chart must be generated as part of your analysis
+
+        CRITICAL: You must create a visual chart/graph for this KPI analysis.
+        """
+
+        if settings.DEEP_ANALYSIS_SINGLE_PASS:
+            #Single pass: the code interpreter run itself answers in the KPIAnalysis shape
+            prompt_kpi += """
+                When you are done, reply with:
+                - business_analysis: your insights about this KPI in business terms
+                - code: leave empty, the executed code is collected automatically
+                - code_explanation: a paragraph explaining what the code does
+                - analysis_steps: a paragraph on how you computed the KPI
+                """
+            with span("llm_kpi", prompt_chars=len(prompt_kpi)) as stage:
+                kpi_response = await openai_client.responses.parse(
+                    model="gpt-4.1-mini",
+                    tools=[{"type": "code_interpreter", "container": container_id}],
+                    tool_choice="required",
+                    input=prompt_kpi,
+                    text_format=KPIAnalysis,
+                    timeout=300
+                )
+                stage.set_usage(kpi_response)
+        else:
+            #Generate response for the kpi with code interpreter
+            with span("llm_kpi", prompt_chars=len(prompt_kpi)) as stage:
+                kpi_response = await openai_client.responses.create(
+                    model="gpt-4.1-mini",
+                    tools=[{"type": "code_interpreter", "container": container_id}],
+                    tool_choice="required",
+                    input=prompt_kpi,
+                    timeout=300
+                )
+                stage.set_usage(kpi_response)
+
+        #Charts written to the shared container after this point belong to other KPIs
+        kpi_finished_at = time.time()
+        print(f"KPI Response received for {kpi}")
+        print(f"Response outputs count: {len(kpi_response.output) if kpi_response.output else 0}")
+
+        # Extract chart file ID using utility function
+        chart_file_id = await extract_file_id_from_response(
+            kpi_response, openai_client, container_id, claimed_chart_ids, kpi_finished_at
+        )
+        chart_url = None
+
+        # Download the chart if file ID was found
+        if chart_file_id:
+            print(f"Attempting to download chart with file ID: {chart_file_id}")
+            chart_url = await download_file_from_container(chart_file_id, container_id, blob_client)
+            print(f"Chart URL successfully extracted: {chart_url}")
+        else:
+            print(f"No chart file found in response for KPI: {kpi}")
+
+        # The code comes straight from the code interpreter calls, no re-summarizing needed
+        executed_code = "\n\n".join(
+            output.code for output in kpi_response.output
+            if output.type == "code_interpreter_call" and output.code
+        )
+
+        analysis = getattr(kpi_response, "output_parsed", None)
+        if analysis is None:
+            #Pass the response for another openai call to get the analysis
+            analysis_prompt = f"""
+            You are an analyst who needs to make sense of work done by another analyst.
+            For the analysis you need to extract:
+
+            1. Business insights
+            2. Code
+            3. Code explanation in a paragraph
+            4. How did agent compute the KPI in a paragraph
+
+            Response: {str(kpi_response)}
+            """
+
+            # Prepare input content - only include image if chart_url is available
+            input_content = [{"type": "input_text", "text": analysis_prompt}]
+            if chart_url:
+                print(f"Including chart in analysis for KPI: {kpi}")
+                input_content.append({
+                    "type": "input_image",
+                    "image_url": chart_url,
+                })
+            else:
+                print(f"No chart to include in analysis for KPI: {kpi}")
+
+            with span("analysis_parse", prompt_chars=len(analysis_prompt)) as stage:
+                analysis_response = await openai_client.responses.parse(
+                    model="gpt-4.1-mini",
+                    input=[{
+                        "role": "user",
+                        "content": input_content,
+                    }],
+                    text_format=KPIAnalysis,
+                    timeout=300
+                )
+                stage.set_usage(analysis_response)
+            analysis = analysis_response.output_parsed
+
+        #Create KPI analysis object
+        kpi_analysis = {
+            "kpi_name": kpi,
+            "business_analysis": analysis.business_analysis,
+            "code": executed_code or analysis.code,
+            "code_explanation": analysis.code_explanation,
+            "chart_url": chart_url,
+            "analysis_steps": analysis.analysis_steps,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+
+        print(f"KPI analysis completed for {kpi}. Chart URL: {chart_url}")
+
+        #Update the session status with the latest KPI analysis and mark it as complete
+        await deep_analysis_collection.update_one(
+            {"session_id": session_id},
+            {"$push": {
+                "kpi_analyses": kpi_analysis
+            },
+            "$set": {
+                f"kpi_status.{kpi}": 1,  # Mark this KPI as analyzed
+                "status": f"Deep Analysis - Analyzing KPI: {kpi}",
+                "updated_at": datetime.now()
+            }},
+            sort={"created_at": -1}
+        )
+
+    except Exception as e:
+        print(f"Error processing KPI {kpi}: {str(e)}")
+        #A dead container fails every later KPI too, so take it out of the pool for the next run
+        container_pool = await get_container_pool()
+        await container_pool.discard_if_gone(container_id, e)
+        # Update database to mark this KPI as failed
+        await deep_analysis_collection.update_one(
+            {"session_id": session_id},
+            {"$set": {
+                f"kpi_status.{kpi}": -1,  # Mark this KPI as failed
+                "status": f"Deep Analysis - KPI {kpi} Failed",
+                "updated_at": datetime.now()
+            }},
+            sort={"created_at": -1}
+        )
+
+async def run_deep_analysis_background(session_id: str, current_user: dict, resume: bool = False, use_cache: bool = True):
+    """
+    Background function - no Depends() needed
+    With resume=True the latest deep_analysis document of the session is picked up again: its file path,
+    KPI list and successfully analyzed KPIs are reused and only failed or missing stages run.
+    With use_cache=False the KPI plan is regenerated even if one is cached for this dataset's schema.
+    """
+    container_pool = None
+    container_id = None
+    # Stage timings of this run, saved on the deep_analysis document as "timings"
+    trace = start_trace()
+    DEEP_ANALYSES_IN_FLIGHT.inc()
     try:
         # Get dependencies manually
         db = await get_db()
-        container_id = await create_new_container()
+        container_pool = await get_container_pool()
+        container_id = await container_pool.acquire()
         openai_client = await get_openai_client()
         blob_client = await get_blob_client()
 
@@ -81,182 +295,127 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
         #Extract csv information from the session document
         csv_info = session_doc.get("csv_info", {})
         
-        #Create initial deep analysis session status
-        session_status={
-            "session_id": session_id,
-            "user_email": current_user.get("email"),
-            "user_id": current_user.get("id"),
-            "file_path": None,
-            "status": "Deep Analysis Started",
-            "csv_info": csv_info,
-            "blob_url": blob_url,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-            "kpi_list": None
-        }
-        await deep_analysis_collection.insert_one(session_status)
-        
-        #Upload the file to the container
-        file_path = await upload_file_to_container(container_id, blob_url)
+        #When resuming, continue from the latest run of this session
+        previous_run = None
+        if resume:
+            previous_run = await deep_analysis_collection.find_one(
+                {"session_id": session_id},
+                sort=[("created_at", -1)]
+            )
 
-        #Update the session status after file upload
-        await deep_analysis_collection.update_one(
-            {"session_id": session_id},
-            {"$set": {
-                "file_path": file_path,
-                "status": "Deep Analysis File Uploaded",
-                "updated_at": datetime.now()
-            }},
-            sort={"created_at": -1}
-        )
+        if previous_run:
+            await deep_analysis_collection.update_one(
+                {"_id": previous_run["_id"]},
+                {"$set": {
+                    "status": "Deep Analysis Resumed",
+                    "updated_at": datetime.now()
+                },
+                "$unset": {"error": ""}}
+            )
+        else:
+            #Create initial deep analysis session status
+            session_status={
+                "session_id": session_id,
+                "user_email": current_user.get("email"),
+                "user_id": current_user.get("id"),
+                "file_path": None,
+                "status": "Deep Analysis Started",
+                "csv_info": csv_info,
+                "blob_url": blob_url,
+                "created_at": datetime.now(),
+                "updated_at": datetime.now(),
+                "kpi_list": None,
+                "container_id": None
+            }
+            await deep_analysis_collection.insert_one(session_status)
         
-        #Generate KPI List for Manager Agent
-        prompt_kpi_list = MANAGER_PROMPT+f"\n\nInformation about the dataset: {csv_info}"
+        #Upload the file to the container (a resumed run on the same container keeps its file path)
+        if previous_run and previous_run.get("file_path") and previous_run.get("container_id") == container_id:
+            file_path = previous_run["file_path"]
+        else:
+            file_path = await get_or_upload_dataset_to_container(container_id, session_doc["file_info"])
 
-        kpi_list_response = await openai_client.responses.parse(
-                model="gpt-4.1-mini",
-                input=prompt_kpi_list,
-                text_format=KPIList,
-                timeout=300
+            #Update the session status after file upload
+            await deep_analysis_collection.update_one(
+                {"session_id": session_id},
+                {"$set": {
+                    "file_path": file_path,
+                    "container_id": container_id,
+                    "status": "Deep Analysis File Uploaded",
+                    "updated_at": datetime.now()
+                }},
+                sort={"created_at": -1}
             )
         
-        kpi_list = kpi_list_response.output_parsed.kpi_list
-        kpi_list=kpi_list[:3]
-        print(f"Generated KPI List: {kpi_list}")
-        
-        #Update the session status with the kpi list and their status
-        await deep_analysis_collection.update_one(
-            {"session_id": session_id}, 
-            {"$set": {
-                "kpi_list": kpi_list,
-                "status": "Deep Analysis KPI List Generated",
-                "updated_at": datetime.now()
-            }},
-            sort={"created_at": -1}
-        )
+        if previous_run and previous_run.get("kpi_list"):
+            kpi_list = previous_run["kpi_list"]
+            print(f"Resuming with KPI List: {kpi_list}")
+        else:
+            #Generate KPI List for Manager Agent (reused across uploads with the same schema)
+            async def plan_kpis():
+                prompt_kpi_list = MANAGER_PROMPT+f"\n\nInformation about the dataset: {describe_dataset(csv_info)}"
 
-        for kpi in kpi_list:
-            try:
-                print(f"Analyzing KPI: {kpi}")
-                
-                #Generate prompt for the kpi with explicit chart creation instruction
-                prompt_kpi = f"""
-                You are a data analyst tasked with analyzing a specific KPI from a dataset.
-                
-                Your task:
-                1. Analyze the KPI: {kpi}
-                2. Use the dataset located at: {file_path}
-                3. Sample data preview: {csv_info}
-                
-                Instructions:
-                - Provide detailed insights about this KPI
-                - ALWAYS create and save a visualization chart for this KPI using matplotlib or seaborn
-                - Make sure to use plt.show() to display and save the chart
-                - Explain your findings in business terms
-                - The chart must be generated as part of your analysis
-                
-                CRITICAL: You must create a visual chart/graph for this KPI analysis.
-                """
-                
-                #Generate response for the kpi with code interpreter
-                kpi_response = await openai_client.responses.create(
-                    model="gpt-4.1-mini",
-                    tools=[{"type": "code_interpreter", "container": container_id}],
-                    tool_choice="required",
-                    input=prompt_kpi,
-                    timeout=300
-                )
-                
-                print(f"KPI Response received for {kpi}")
-                print(f"Response outputs count: {len(kpi_response.output) if kpi_response.output else 0}")
-                
-                # Extract chart file ID using utility function
-                chart_file_id = await extract_file_id_from_response(kpi_response, openai_client)
-                chart_url = None
-                
-                # Download the chart if file ID was found
-                if chart_file_id:
-                    print(f"Attempting to download chart with file ID: {chart_file_id}")
-                    chart_url = await download_file_from_container(chart_file_id, container_id, blob_client)
-                    print(f"Chart URL successfully extracted: {chart_url}")
-                else:
-                    print(f"No chart file found in response for KPI: {kpi}")
-
-                #Pass the response for another openai call to get the analysis
-                analysis_prompt = f"""
-                You are an analyst who needs to make sense of work done by another analyst.
-                For the analysis you need to extract:
-
-                1. Business insights
-                2. Code
-                3. Code explanation in a paragraph
-                4. How did agent compute the KPI in a paragraph
-
-                Response: {str(kpi_response)}
-                """
-                
-                # Prepare input content - only include image if chart_url is available
-                input_content = [{"type": "input_text", "text": analysis_prompt}]
-                if chart_url:
-                    print(f"Including chart in analysis for KPI: {kpi}")
-                    input_content.append({
-                        "type": "input_image",
-                        "image_url": chart_url,
-                    })
-                else:
-                    print(f"No chart to include in analysis for KPI: {kpi}")
-                
-                analysis_response = await openai_client.responses.parse(
-                    model="gpt-4.1-mini",
-                    input=[{
-                        "role": "user",
-                        "content": input_content,
-                    }],
-                    text_format=KPIAnalysis,
-                    timeout=300
-                )
-                
-                #Create KPI analysis object
-                kpi_analysis = {
-                    "kpi_name": kpi,
-                    "business_analysis": analysis_response.output_parsed.business_analysis,
-                    "code": analysis_response.output_parsed.code,
-                    "code_explanation": analysis_response.output_parsed.code_explanation,
-                    "chart_url": chart_url,
-                    "analysis_steps": analysis_response.output_parsed.analysis_steps,
-                    "created_at": datetime.now(),
+                with span("llm_kpi_plan", prompt_chars=len(prompt_kpi_list)) as stage:
+                    kpi_list_response = await openai_client.responses.parse(
+                            model="gpt-4.1-mini",
+                            input=prompt_kpi_list,
+                            text_format=KPIList,
+                            timeout=300
+                        )
+                    stage.set_usage(kpi_list_response)
+                return kpi_list_response.output_parsed.kpi_list
+
+            kpi_list = await get_or_create_for_schema("kpi_list", csv_info, plan_kpis, use_cache=use_cache)
+            kpi_list=kpi_list[:3]
+            print(f"Generated KPI List: {kpi_list}")
+            
+            #Update the session status with the kpi list and their status
+            await deep_analysis_collection.update_one(
+                {"session_id": session_id}, 
+                {"$set": {
+                    "kpi_list": kpi_list,
+                    "status": "Deep Analysis KPI List Generated",
                     "updated_at": datetime.now()
-                }
-                
-                print(f"KPI analysis completed for {kpi}. Chart URL: {chart_url}")
-                
-                #Update the session status with the latest KPI analysis and mark it as complete
-                await deep_analysis_collection.update_one(
-                    {"session_id": session_id},
-                    {"$push": {
-                        "kpi_analyses": kpi_analysis
-                    },
-                    "$set": {
-                        f"kpi_status.{kpi}": 1,  # Mark this KPI as analyzed
-                        "status": f"Deep Analysis - Analyzing KPI: {kpi}",
-                        "updated_at": datetime.now()
-                    }},
-                    sort={"created_at": -1}
-                )
-                    
-            except Exception as e:
-                print(f"Error processing KPI {kpi}: {str(e)}")
-                # Update database to mark this KPI as failed
-                await deep_analysis_collection.update_one(
-                    {"session_id": session_id},
-                    {"$set": {
-                        f"kpi_status.{kpi}": -1,  # Mark this KPI as failed
-                        "status": f"Deep Analysis - KPI {kpi} Failed",
-                        "updated_at": datetime.now()
-                    }},
-                    sort={"created_at": -1}
+                }},
+                sort={"created_at": -1}
+            )
+
+        #Only KPIs that were not analyzed successfully yet need to run
+        kpi_status = (previous_run or {}).get("kpi_status", {})
+        pending_kpis = [kpi for kpi in kpi_list if kpi_status.get(kpi) != 1]
+        if previous_run and pending_kpis:
+            # Drop any partial results of the KPIs that run again
+            await deep_analysis_collection.update_one(
+                {"session_id": session_id},
+                {"$pull": {"kpi_analyses": {"kpi_name": {"$in": pending_kpis}}}},
+                sort={"created_at": -1}
+            )
+
+        #Analyze the KPIs concurrently, bounded by the configured limit
+        kpi_semaphore = asyncio.Semaphore(max(1, settings.DEEP_ANALYSIS_KPI_CONCURRENCY))
+        #Chart file ids already taken by a KPI of this run
+        claimed_chart_ids = set()
+
+        async def analyze_kpi_bounded(kpi: str):
+            async with kpi_semaphore:
+                await analyze_kpi(
+                    kpi, session_id, container_id, file_path, csv_info,
+                    openai_client, blob_client, deep_analysis_collection, claimed_chart_ids
                 )
-                continue
+
+        await asyncio.gather(*(analyze_kpi_bounded(kpi) for kpi in pending_kpis))
+
+        #Nothing changed since the resumed run finished its summary and report, so keep them
+        if previous_run and not pending_kpis and previous_run.get("summary") and previous_run.get("report_url"):
+            await deep_analysis_collection.update_one(
+                {"_id": previous_run["_id"]},
+                {"$set": {
+                    "status": "Deep Analysis Complete",
+                    "timings": trace.timings(),
+                    "updated_at": datetime.now()
+                }}
+            )
+            return
 
         #Get all the kpi analyses after processing all KPIs
         session_data = await deep_analysis_collection.find_one({"session_id": session_id})
@@ -271,11 +430,13 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
         Focus on the most important trends, patterns, and actionable insights that would be valuable for business decision-making.
         """
         
-        summary_response = await openai_client.responses.create(
-            model="gpt-4.1-mini",
-            input=summary_prompt,
-            timeout=300
-        )
+        with span("summary", prompt_chars=len(summary_prompt)) as stage:
+            summary_response = await openai_client.responses.create(
+                model="gpt-4.1-mini",
+                input=summary_prompt,
+                timeout=300
+            )
+            stage.set_usage(summary_response)
         
         summary = summary_response.output_text
 
@@ -291,7 +452,9 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
         )
 
         # Generate HTML report by pulling data from DB
-        html_content = await create_html_report(session_id)
+        with span("report_render") as stage:
+            html_content = await create_html_report(session_id)
+            stage.set(bytes=len(html_content))
         
         # Upload report to blob storage
         report_url = await upload_report_to_blob(html_content, blob_client, session_id)
@@ -302,6 +465,7 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
             {"$set": {
                 "status": "Deep Analysis Complete",
                 "report_url": report_url,
+                "timings": trace.timings(),
                 "updated_at": datetime.now()
             }},
             sort={"created_at": -1}
@@ -309,6 +473,8 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
 
     except Exception as e:
         await log_error(e, "deep_analysis/routes.py", "run_deep_analysis_background")
+        if container_id:
+            await container_pool.discard_if_gone(container_id, e)
         # Update status to failed
         db = await get_db()  # Get db again for error handling
         await db["deep_analysis"].update_one(
@@ -316,9 +482,16 @@ async def run_deep_analysis_background(session_id: str, current_user: dict):
             {"$set": {
                 "status": "Deep Analysis Failed", 
                 "error": str(e),
+                "timings": trace.timings(),
                 "updated_at": datetime.now()
             }}
         )
+    finally:
+        # Hand the container back to the pool
+        if container_id:
+            container_pool.release(container_id)
+        DEEP_ANALYSES_IN_FLIGHT.dec()
+        trace.end()
 
 @router.get("/status/{session_id}")
 async def get_deep_analysis_status(
@@ -336,7 +509,18 @@ async def get_deep_analysis_status(
         )
         
         if not session_data:
-            raise HTTPException(status_code=404, detail="Deep analysis session not found")
+            # The job may still be waiting for a worker
+            active_job = await get_active_job(session_id)
+            if not active_job:
+                raise HTTPException(status_code=404, detail="Deep analysis session not found")
+            return {
+                "status": "Deep Analysis Queued",
+                "kpi_list": [],
+                "kpi_status": {},
+                "report_url": None,
+                "created_at": active_job.get("created_at"),
+                "updated_at": active_job.get("updated_at")
+            }
             
         # Extract relevant status information
         status_info = {
@@ -14,6 +14,3 @@ class KPIAnalysis(BaseModel):
     code: str
     code_explanation: str
     analysis_steps: str
-
-class FileIDResponse(BaseModel):
-    file_id: str
@@ -1,58 +1,143 @@
-from typing import Any, Optional
-from app.deep_analysis.schemas import FileIDResponse
+import re
+import time
+from collections import Counter
+from typing import Any, List, Optional, Set
+from app.chat.utils import get_field
+from app.core.tracing import span
+from app.core.metrics import register_counter
 
-async def extract_file_id_from_response(response: Any, openai_client) -> Optional[str]:
+# Container file ids look like "cfile_" + a long hex token (older responses used "file-" + a long opaque token
+# with digits in it), so words like "file-based" in the model's text never match
+FILE_ID_PATTERN = re.compile(r"\b(cfile_[A-Za-z0-9]{16,}|file-(?=[A-Za-z]*[0-9])[A-Za-z0-9]{20,})\b")
+
+# Image extensions charts are saved with inside the container
+CHART_EXTENSIONS = (".png", ".jpg", ".jpeg", ".svg", ".gif", ".webp")
+
+# How often each strategy found the chart file id (plus "none" when all of them missed)
+FILE_ID_STRATEGY_HITS: Counter = Counter()
+register_counter("chart_file_id_lookups_total", "Chart file id lookups by the strategy that found it", FILE_ID_STRATEGY_HITS, ["strategy"])
+
+def is_image_file(file: Any) -> bool:
+    """Whether a file reference (annotation, files result entry or container file) is an image"""
+    mime_type = get_field(file, "mime_type") or ""
+    name = get_field(file, "filename") or get_field(file, "path") or ""
+    return mime_type.startswith("image/") or name.lower().endswith(CHART_EXTENSIONS)
+
+def find_file_id_in_outputs(response: Any) -> tuple[Optional[str], Optional[str]]:
+    """
+    Walk every output item of a response and return (file_id, strategy) for the first chart file found.
+
+    Covers:
+    - message outputs whose output_text annotations include a container_file_citation of an image file
+    - code_interpreter_call outputs with "files" results (files[].file_id of an image) or "image"
+      results/outputs (image.file_id)
+    The code may also write and cite CSVs or other files, so only images count as charts.
+    Items may be SDK models or plain dicts (annotation types newer than the SDK come back untyped).
+    """
+    for output in get_field(response, "output") or []:
+        output_type = get_field(output, "type")
+
+        if output_type == "message":
+            for content in get_field(output, "content") or []:
+                for annotation in get_field(content, "annotations") or []:
+                    if (get_field(annotation, "type") == "container_file_citation" and get_field(annotation, "file_id")
+                            and is_image_file(annotation)):
+                        return get_field(annotation, "file_id"), "annotation"
+
+        elif output_type == "code_interpreter_call":
+            for result in (get_field(output, "results") or []) + (get_field(output, "outputs") or []):
+                result_type = get_field(result, "type")
+                if result_type == "files":
+                    for file in get_field(result, "files") or []:
+                        if get_field(file, "file_id") and is_image_file(file):
+                            return get_field(file, "file_id"), "code_interpreter_result"
+                elif result_type == "image":
+                    image_file_id = get_field(get_field(result, "image"), "file_id")
+                    if image_file_id:
+                        return image_file_id, "code_interpreter_result"
+
+    return None, None
+
+def find_file_ids_in_text(response: Any) -> List[str]:
+    """
+    Scan the serialized response for everything shaped like a container file id, in order of appearance
     """
-    Extract file ID from OpenAI response using multiple approaches.
+    serialized = response.model_dump_json() if hasattr(response, "model_dump_json") else str(response)
+    return list(dict.fromkeys(FILE_ID_PATTERN.findall(serialized)))
+
+async def find_image_id_in_text(response: Any, openai_client, container_id: str) -> Optional[str]:
+    """
+    The first file id in the serialized response that is an image in the container (the text alone does not say
+    what kind of file an id points to, so every candidate is looked up)
+    """
+    for file_id in find_file_ids_in_text(response):
+        try:
+            container_file = await openai_client.containers.files.retrieve(file_id, container_id=container_id)
+        except Exception:
+            # Not a file of this container
+            continue
+        if is_image_file(container_file):
+            return file_id
+    return None
+
+async def find_file_id_in_container(
+    response: Any,
+    openai_client,
+    container_id: str,
+    claimed_file_ids: Optional[Set[str]] = None,
+    finished_at: Optional[float] = None
+) -> Optional[str]:
+    """
+    Last resort: the newest image the assistant wrote to the container while this response ran.
+    KPIs analyzed concurrently share the container, so files written before the response started or after it
+    finished are skipped, and so are the ids sibling KPIs have already claimed (see extract_file_id_from_response).
+    finished_at is when the response completed (its completed_at when the API reports one).
+    """
+    started_at = get_field(response, "created_at") or 0
+    finished_at = get_field(response, "completed_at") or finished_at or time.time()
+    claimed_file_ids = claimed_file_ids or set()
+    async for container_file in openai_client.containers.files.list(container_id, order="desc", limit=20):
+        if container_file.created_at < int(started_at):
+            break
+        if container_file.created_at > finished_at or container_file.id in claimed_file_ids:
+            continue
+        if container_file.source == "assistant" and is_image_file(container_file):
+            return container_file.id
+    return None
+
+async def extract_file_id_from_response(
+    response: Any,
+    openai_client=None,
+    container_id: Optional[str] = None,
+    claimed_file_ids: Optional[Set[str]] = None,
+    finished_at: Optional[float] = None
+) -> Optional[str]:
+    """
+    Extract the chart file ID from an OpenAI response without any extra LLM call.
+    Tries, in order: typed walk of the outputs, then (if a container is given) a regex scan of the serialized
+    response checked against the container, and a listing of the container's files.
+    Requests sharing a container pass the same claimed_file_ids set: the id found is added to it,
+    so the listing never hands one chart to two requests. finished_at (time.time() when the response call
+    returned) bounds the listing when the response carries no completed_at.
     Returns the file ID if found, None otherwise.
     """
-    # Approach 1: Check message outputs with content and annotations
-    for output in response.output:
-        if hasattr(output, 'content') and output.content:
-            for content in output.content:
-                if hasattr(content, 'annotations') and content.annotations:
-                    for annotation in content.annotations:
-                        if (hasattr(annotation, 'type') and 
-                            annotation.type == 'container_file_citation' and
-                            hasattr(annotation, 'file_id')):
-                            return annotation.file_id
-
-        # Approach 2: Check code interpreter tool calls
-        elif hasattr(output, 'type') and output.type == 'code_interpreter_call':
-            if hasattr(output, 'outputs') and output.outputs:
-                for tool_output in output.outputs:
-                    if (hasattr(tool_output, 'type') and 
-                        tool_output.type == 'image' and
-                        hasattr(tool_output, 'image') and
-                        hasattr(tool_output.image, 'file_id')):
-                        return tool_output.image.file_id
-
-        # Approach 3: Check ResponseCodeInterpreterToolCall structure
-        elif hasattr(output, '__class__') and 'CodeInterpreter' in str(output.__class__):
-            if hasattr(output, 'results') and output.results:
-                for result in output.results:
-                    if hasattr(result, 'type') and result.type == 'image':
-                        if hasattr(result, 'image') and hasattr(result.image, 'file_id'):
-                            return result.image.file_id
-
-    # Approach 4: Use LLM to extract file ID if other approaches fail
-    try:
-        prompt = f"""
-        Look for file IDs in this OpenAI response. File IDs start with "file-" followed by alphanumeric characters.
-        Extract ONLY the file_id string (example: "file-abc123xyz789").
-
-        Response: {str(response)}
-
-        Return the file_id if found, or null if no file_id exists.
-        """
-        
-        llm_response = await openai_client.responses.parse(
-            model="gpt-4.1-mini",
-            input=prompt,
-            text_format=FileIDResponse,
-            timeout=300
-        )
-        
-        return llm_response.output_parsed.file_id
-    except Exception:
-        return None
+    file_id, strategy = find_file_id_in_outputs(response)
+
+    if file_id is None and openai_client is not None and container_id:
+        file_id = await find_image_id_in_text(response, openai_client, container_id)
+        strategy = "regex"
+
+        if file_id is None:
+            try:
+                with span("file_id_listing"):
+                    file_id = await find_file_id_in_container(
+                        response, openai_client, container_id, claimed_file_ids, finished_at
+                    )
+                strategy = "container_listing"
+            except Exception as e:
+                print(f"Container file listing failed: {e}")
+
+    if file_id and claimed_file_ids is not None:
+        claimed_file_ids.add(file_id)
+    FILE_ID_STRATEGY_HITS[strategy if file_id else "none"] += 1
+    return file_id
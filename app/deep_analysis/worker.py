@@ -0,0 +1,119 @@
+'''
+Note: Deep analysis worker process.
+
+Leases jobs from the deep_analysis_jobs queue and runs them, so multi-minute analyses never run inside the API
+workers' event loop. Run one or more of these next to the API:
+
+python -m app.deep_analysis.worker
+'''
+import asyncio
+import os
+import socket
+import uuid
+from app.core.config import settings
+from app.db.mongo import get_client, get_db, log_error, start_error_sink, stop_error_sink
+from app.core.http_client import get_http_session, close_http_session
+from app.container.pool import get_container_pool
+from app.core.metrics import start_metrics_server
+from app.deep_analysis.jobs import lease_next_job, heartbeat_job, finish_job, fail_exhausted_jobs, JOB_DONE, JOB_FAILED
+from app.deep_analysis.routes import run_deep_analysis_background
+
+async def keep_lease(job_id, worker_id: str):
+    """Heartbeat a job; returns once the lease is lost (another worker may own the job by then)"""
+    interval = max(1, settings.DEEP_ANALYSIS_JOB_LEASE_SECONDS // 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await heartbeat_job(job_id, worker_id):
+                print(f"Worker {worker_id}: lost the lease on job {job_id}")
+                return
+        except Exception as e:
+            # A missed heartbeat is retried; the lease only runs out after DEEP_ANALYSIS_JOB_LEASE_SECONDS
+            await log_error(e, "deep_analysis/worker.py", "keep_lease")
+
+async def run_job(job: dict, worker_id: str):
+    """Run one leased job and record its outcome; the run is cancelled if the lease is lost"""
+    heartbeat = asyncio.create_task(keep_lease(job["_id"], worker_id))
+    analysis = None
+    try:
+        db = await get_db()
+        # A retried job picks up where the previous worker died instead of starting over
+        resume = job.get("resume", False) or job["attempts"] > 1
+
+        analysis = asyncio.create_task(run_deep_analysis_background(
+            job["session_id"], job["user"], resume=resume, use_cache=job.get("use_cache", True)
+        ))
+        await asyncio.wait({analysis, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        if not analysis.done():
+            # The job is someone else's now, so stop working on it and leave its outcome to them
+            print(f"Worker {worker_id}: cancelling job {job['_id']}")
+            return
+        analysis.result()
+
+        # run_deep_analysis_background records its own failures on the deep_analysis document
+        analysis_doc = await db["deep_analysis"].find_one(
+            {"session_id": job["session_id"]},
+            projection={"status": 1, "error": 1},
+            sort=[("created_at", -1)]
+        )
+        if analysis_doc and analysis_doc.get("status") == "Deep Analysis Failed":
+            await finish_job(job["_id"], worker_id, JOB_FAILED, analysis_doc.get("error"))
+        else:
+            await finish_job(job["_id"], worker_id, JOB_DONE)
+
+    except Exception as e:
+        await log_error(e, "deep_analysis/worker.py", "run_job")
+        await finish_job(job["_id"], worker_id, JOB_FAILED, str(e))
+    finally:
+        heartbeat.cancel()
+        if analysis is not None and not analysis.done():
+            analysis.cancel()
+            try:
+                await analysis
+            except asyncio.CancelledError:
+                pass
+
+async def worker_slot(worker_id: str):
+    """Lease and run jobs one at a time, forever"""
+    while True:
+        try:
+            await fail_exhausted_jobs()
+            job = await lease_next_job(worker_id)
+        except Exception as e:
+            await log_error(e, "deep_analysis/worker.py", "worker_slot")
+            job = None
+
+        if job is None:
+            await asyncio.sleep(settings.DEEP_ANALYSIS_WORKER_POLL_SECONDS)
+            continue
+
+        print(f"Worker {worker_id}: running job {job['_id']} for session {job['session_id']} (attempt {job['attempts']})")
+        await run_job(job, worker_id)
+
+async def run_worker(slots: int = None):
+    """
+    Run `slots` concurrent job slots in this process (defaults to DEEP_ANALYSIS_WORKER_CONCURRENCY)
+    """
+    slots = slots or settings.DEEP_ANALYSIS_WORKER_CONCURRENCY
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    await asyncio.gather(*(worker_slot(f"{worker_id}-{slot}") for slot in range(slots)))
+
+if __name__ == "__main__":
+    async def main():
+        await get_client()
+        start_error_sink()
+        await get_http_session()
+        await get_container_pool()
+        # This process runs the analyses, so Prometheus scrapes their metrics here (the API serves its own)
+        metrics_server = None
+        if settings.DEEP_ANALYSIS_WORKER_METRICS_PORT:
+            metrics_server = await start_metrics_server(settings.DEEP_ANALYSIS_WORKER_METRICS_PORT)
+        try:
+            await run_worker()
+        finally:
+            if metrics_server:
+                await metrics_server.cleanup()
+            await close_http_session()
+            await stop_error_sink()
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+'''
+Note: Schema-fingerprint cache for planning LLM calls.
+
+Users keep uploading the same exports (same columns, same types, fresh rows). The KPI plan and the smart
+questions only depend on the shape of the data, so they are cached in the "schema_cache" collection under a
+fingerprint of the normalized schema and reused for every later upload with that schema.
+Entries expire after SCHEMA_CACHE_TTL_SECONDS (a TTL index on expires_at removes them).
+'''
+import hashlib
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+from app.core.config import settings
+from app.core.metrics import register_counter
+from app.db.mongo import get_db, log_error
+
+# (kind, "hit" | "miss" | "bypass") -> count, e.g. ("kpi_list", "hit")
+SCHEMA_CACHE_STATS: Counter = Counter()
+register_counter("schema_cache_lookups_total", "Schema cache lookups by kind and outcome", SCHEMA_CACHE_STATS, ["kind", "outcome"])
+
+def schema_fingerprint(csv_info: dict) -> str:
+    """
+    Fingerprint of a dataset's schema: column names (trimmed, case-folded) with their inferred types.
+    Column order does not matter; sessions without a profile fingerprint on names alone.
+    """
+    dtypes = {profile["name"]: profile["dtype"] for profile in csv_info.get("column_profiles") or []}
+    columns = sorted(
+        (str(name).strip().casefold(), dtypes.get(name, "unknown"))
+        for name in csv_info.get("column_names") or []
+    )
+    return hashlib.sha256(json.dumps(columns).encode("utf-8")).hexdigest()
+
+async def get_or_create_for_schema(
+    kind: str,
+    csv_info: dict,
+    create: Callable[[], Awaitable[Any]],
+    use_cache: bool = True
+) -> Any:
+    """
+    Return the cached `kind` value for this dataset's schema, or call `create()` and cache its result.
+    With use_cache=False the cache is not read, but the fresh result still replaces the cached one.
+    Cache failures never fail the caller.
+    """
+    fingerprint = schema_fingerprint(csv_info)
+    cache_filter = {"kind": kind, "fingerprint": fingerprint}
+
+    if not settings.SCHEMA_CACHE_ENABLED:
+        return await create()
+
+    if use_cache:
+        try:
+            db = await get_db()
+            cached = await db["schema_cache"].find_one(
+                {**cache_filter, "expires_at": {"$gt": datetime.utcnow()}},
+                projection={"value": 1}
+            )
+            if cached is not None:
+                SCHEMA_CACHE_STATS[(kind, "hit")] += 1
+                print(f"Schema cache hit: {kind} {fingerprint[:12]}")
+                return cached["value"]
+        except Exception as e:
+            await log_error(error=e, location="get_or_create_for_schema", additional_info={"kind": kind})
+        SCHEMA_CACHE_STATS[(kind, "miss")] += 1
+    else:
+        SCHEMA_CACHE_STATS[(kind, "bypass")] += 1
+
+    value = await create()
+
+    try:
+        db = await get_db()
+        now = datetime.utcnow()
+        await db["schema_cache"].update_one(
+            cache_filter,
+            {"$set": {
+                "value": value,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=settings.SCHEMA_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        await log_error(error=e, location="get_or_create_for_schema", additional_info={"kind": kind})
+    return value
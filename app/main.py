@@ -1,13 +1,21 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from app.auth.routes import router as auth_router
-from app.db.mongo import get_client
+from app.db.mongo import get_client, start_error_sink, stop_error_sink
+from app.db.indexes import ensure_indexes, verify_query_plans
+from app.core.http_client import get_http_session, close_http_session
 from app.auth.utils import handle_validation_error
 from app.chat.routes import router as chat_router
 from app.sessions.routes import router as sessions_router
 from app.llm.openai_client import client as openai_client
 from app.deep_analysis.routes import router as deep_analysis_router
+from app.container.pool import get_container_pool
+from app.core.config import settings
+from app.core.tracing import ServerTimingMiddleware
+from app.core.metrics import render_metrics
+import asyncio
 app = FastAPI(title="Deep Analysis API")
 
 # Configure CORS
@@ -17,8 +25,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-stage timings of every request in a Server-Timing header (see app/core/tracing.py)
+app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(chat_router, prefix="/chat", tags=["Chat"])
@@ -34,13 +46,50 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def startup_db_client():
     # Initialize the MongoDB client when the app starts
     await get_client()
+    # Batch error logs instead of writing each one on the failing request's own time
+    start_error_sink()
+    # Create missing indexes, then make sure no hot query falls back to a collection scan
+    await ensure_indexes()
+    if settings.MONGO_VERIFY_QUERY_PLANS:
+        await verify_query_plans()
+    # Initialize the shared, pooled HTTP session for OpenAI and Azure calls
+    await get_http_session()
+    # Start warming the container pool in the background so the first chat turn does not pay for container creation
+    await get_container_pool()
+
+    # Deep analyses run in separate worker processes (python -m app.deep_analysis.worker) so they never share
+    # the API's event loop; DEEP_ANALYSIS_EMBEDDED_WORKERS > 0 runs them here instead, for single-container dev
+    if settings.DEEP_ANALYSIS_EMBEDDED_WORKERS > 0:
+        from app.deep_analysis.worker import run_worker
+        app.state.deep_analysis_workers = asyncio.create_task(run_worker(settings.DEEP_ANALYSIS_EMBEDDED_WORKERS))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Stop embedded deep analysis workers first, while Mongo and HTTP are still open for their teardown
+    # (their jobs are retried once the lease expires)
+    workers = getattr(app.state, "deep_analysis_workers", None)
+    if workers:
+        workers.cancel()
+        try:
+            await workers
+        except asyncio.CancelledError:
+            pass
+
+    # Stop refreshing the container pool
+    from app.container.pool import pool
+    if pool:
+        await pool.stop()
+
+    # Write the errors still queued while Mongo is reachable
+    await stop_error_sink()
+
     # Close the MongoDB client when the app shuts down
     from app.db.mongo import client
     if client:
         client.close()
+
+    # Close the shared HTTP session and its pooled connections
+    await close_http_session()
     
     # Reset the OpenAI client
     global openai_client
@@ -48,4 +97,9 @@ async def shutdown_db_client():
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Deep Analysis API"}
\ No newline at end of file
+    return {"message": "Welcome to Deep Analysis API"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this process (see app/core/metrics.py)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
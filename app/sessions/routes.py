@@ -1,6 +1,10 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from typing import List, Dict, Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
 import uuid
+import json
+from bson import ObjectId
 from app.auth.utils import get_current_user
 from app.db.mongo import get_db
 from pymongo.database import Database
@@ -13,6 +17,10 @@ from app.core.config import settings
 from app.db.mongo import log_error
 from app.chat.schemas import UploadCSVResponse
 from app.sessions.schemas import GetAllSessions
+from app.sessions.utils import (
+    SESSION_LIST_PROJECTION, SESSION_LIST_SORT, encode_session_cursor, decode_session_cursor,
+    sessions_after, keyset_filter, message_page_pipeline, count_user_sessions, invalidate_session_count
+)
 
 router = APIRouter()
 
@@ -20,28 +28,47 @@ router = APIRouter()
 async def get_all_sessions(
     page: int = 1, 
     limit: int = 10, 
+    cursor: Optional[str] = None,
+    full: bool = False,
+    include_total: bool = True,
     current_user: dict = Depends(get_current_user), 
     db: Database = Depends(get_db)
 ):
+    """
+    List the user's sessions, newest first.
+    Pass pagination.next_cursor back as cursor to get the next page with an index seek instead of skip();
+    page alone still works. full=True returns complete session documents instead of the list fields,
+    include_total=False skips counting the user's sessions.
+    """
     try:
         email = current_user["email"]
         collection = db["csv_sessions"]
-        
-        # Calculate skip value for pagination
-        skip = (page - 1) * limit
-        
-        # Get total count for pagination metadata
-        total_count = await collection.count_documents({"user_email": email})
-        
-        # Get paginated sessions
-        cursor = collection.find({"user_email": email}).sort("created_at", -1).skip(skip).limit(limit)
+        projection = None if full else SESSION_LIST_PROJECTION
+
+        if cursor:
+            position = decode_session_cursor(cursor)
+            if position is None:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            created_at, last_id, page = position
+            query, skip = sessions_after(email, created_at, last_id), 0
+        else:
+            # Calculate skip value for pagination
+            query, skip = {"user_email": email}, (page - 1) * limit
+
+        # One extra session tells us whether there is a next page without counting
+        find_cursor = collection.find(query, projection=projection).sort(SESSION_LIST_SORT).skip(skip).limit(limit + 1)
+        documents = await find_cursor.to_list(length=limit + 1)
+        has_next = len(documents) > limit
+        documents = documents[:limit]
+
         sessions = [{"_id": str(session["_id"]) if "_id" in session else None, **{k: v for k, v in session.items() if k != "_id"}} 
-                   async for session in cursor]
+                   for session in documents]
         
-        # Calculate pagination metadata
-        total_pages = (total_count + limit - 1) // limit  # Ceiling division
-        has_next = page < total_pages
-        has_prev = page > 1
+        # Get total count for pagination metadata
+        total_count = total_pages = None
+        if include_total:
+            total_count = await count_user_sessions(collection, email)
+            total_pages = (total_count + limit - 1) // limit  # Ceiling division
         
         return {
             "sessions": sessions,
@@ -51,9 +78,12 @@ async def get_all_sessions(
                 "total_count": total_count,
                 "limit": limit,
                 "has_next": has_next,
-                "has_prev": has_prev
+                "has_prev": page > 1,
+                "next_cursor": encode_session_cursor(documents[-1], page + 1) if has_next else None
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         await log_error(error=e, location="get_all_sessions", additional_info={"user_email": current_user.get("email")})
         raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
@@ -92,6 +122,7 @@ async def delete_session(session_id: str, current_user: dict = Depends(get_curre
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=500, detail="Failed to delete session")
+        invalidate_session_count(email)
             
         return {"message": "Session deleted successfully"}
     except Exception as e:
@@ -101,30 +132,125 @@ async def delete_session(session_id: str, current_user: dict = Depends(get_curre
 @router.get("/get_session_messages")
 async def get_session_messages(
     session_id: str, 
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    include_code: bool = False,
     current_user: dict = Depends(get_current_user), 
     db: Database = Depends(get_db)
 ):
+    """
+    A page of the session's messages, oldest first.
+    Without after/before this is the latest `limit` messages; before=<message_id> pages back through older
+    history and after=<message_id> returns what was added since that message (for incremental refresh).
+    limit defaults to MESSAGES_PAGE_SIZE, 0 returns every message. Code and code explanations are left out
+    (metadata.has_code tells whether there is any) unless include_code=True.
+    The messages array is streamed out as it is read from Mongo.
+    """
     try:
         # Verify session belongs to user
         session = await db["csv_sessions"].find_one({
             "user_email": current_user["email"], 
             "session_id": session_id
-        })
+        }, projection={"_id": 1})
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Get messages
-        messages = await db["messages"].find(
-            {"session_id": session_id}
-        ).sort("created_at", 1).to_list(length=None)
-        
-        # Convert ObjectId to string for each message
-        formatted_messages = []
-        for message in messages:
-            formatted_message = {"_id": str(message["_id"]) if "_id" in message else None, **{k: v for k, v in message.items() if k != "_id"}}
-            formatted_messages.append(formatted_message)
-        
-        return {"messages": formatted_messages, "count": len(formatted_messages)}
+
+        if after and before:
+            raise HTTPException(status_code=400, detail="Pass either after or before, not both")
+        limit = settings.MESSAGES_PAGE_SIZE if limit is None else limit
+        if limit < 0:
+            raise HTTPException(status_code=400, detail="limit must not be negative")
+
+        query = {"session_id": session_id}
+        anchor_id = after or before
+        if anchor_id:
+            anchor = None
+            if ObjectId.is_valid(anchor_id):
+                anchor = await db["messages"].find_one(
+                    {"_id": ObjectId(anchor_id), "session_id": session_id},
+                    projection={"created_at": 1}
+                )
+            if not anchor:
+                raise HTTPException(status_code=404, detail="Message not found")
+            query = keyset_filter(query, anchor["created_at"], anchor["_id"], "$gt" if after else "$lt")
+
+        # The latest page and older pages are read newest first (one page, buffered) and put back in order
+        newest_first = limit > 0 and not after
+        pipeline = message_page_pipeline(query, newest_first, limit + 1 if limit else 0, include_code)
+        messages = await db["messages"].aggregate(pipeline)
+        has_more = False
+        if newest_first:
+            page = await messages.to_list(length=limit + 1)
+            has_more = len(page) > limit
+            messages = page[:limit][::-1]
+
+    except HTTPException:
+        raise
     except Exception as e:
         await log_error(error=e, location="get_session_messages", additional_info={"session_id": session_id})
-        raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
+
+    async def message_array():
+        count = 0
+        more = has_more
+        yield '{"messages": ['
+        try:
+            async for message in _iterate_messages(messages):
+                # The extra message fetched past the page only tells us there is more
+                if limit and count == limit:
+                    more = True
+                    break
+                formatted_message = {"_id": str(message["_id"]) if "_id" in message else None, **{k: v for k, v in message.items() if k != "_id"}}
+                yield ("," if count else "") + json.dumps(jsonable_encoder(formatted_message))
+                count += 1
+        except Exception as e:
+            await log_error(error=e, location="get_session_messages", additional_info={"session_id": session_id})
+            raise
+        yield f'], "count": {count}, "has_more": {json.dumps(more)}}}'
+
+    return StreamingResponse(message_array(), media_type="application/json")
+
+@router.get("/get_message_code")
+async def get_message_code(message_id: str, current_user: dict = Depends(get_current_user), db: Database = Depends(get_db)):
+    """
+    The code and code explanation of one message, for messages paged in without them (metadata.has_code)
+    """
+    try:
+        message = None
+        if ObjectId.is_valid(message_id):
+            message = await db["messages"].find_one(
+                {"_id": ObjectId(message_id)},
+                projection={"session_id": 1, "metadata.code": 1, "metadata.code_explanation": 1, "metadata.code_explanation_status": 1}
+            )
+        if not message:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        session = await db["csv_sessions"].find_one(
+            {"user_email": current_user["email"], "session_id": message["session_id"]},
+            projection={"_id": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        metadata = message.get("metadata", {})
+        return {
+            "message_id": message_id,
+            "code": metadata.get("code"),
+            "code_explanation": metadata.get("code_explanation"),
+            "code_explanation_status": metadata.get("code_explanation_status")
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        await log_error(error=e, location="get_message_code", additional_info={"message_id": message_id})
+        raise HTTPException(status_code=500, detail="Something went wrong at our end. Don't worry, we will fix it asap.")
+
+async def _iterate_messages(messages):
+    """Async iteration over either a buffered page or a live aggregation cursor"""
+    if isinstance(messages, list):
+        for message in messages:
+            yield message
+    else:
+        async for message in messages:
+            yield message
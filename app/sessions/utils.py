@@ -0,0 +1,94 @@
+'''
+Note: Helpers for listing a user's sessions and their messages.
+
+The session list is paged with a keyset on (created_at, _id), newest first: every page is a single index range
+scan no matter how deep it is, unlike skip() which walks and discards every earlier session. The position is
+handed to the client as an opaque continuation token.
+
+Counting a user's sessions is the other per-page cost, so the total is cached per user for
+SESSION_COUNT_CACHE_TTL_SECONDS and dropped whenever this process creates or deletes one of their sessions.
+
+Message history is paged the same way on (created_at, _id), oldest first, anchored on a message id, and leaves
+out the generated code and its explanation (the bulk of a long analysis session) unless they are asked for.
+'''
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.core.config import settings
+
+# What the session list shows; preview rows, column profiles and smart questions are only needed once a session is opened
+SESSION_LIST_PROJECTION = {
+    "session_id": 1,
+    "file_info.original_filename": 1,
+    "file_info.file_size": 1,
+    "csv_info.total_columns": 1,
+    "csv_info.row_count": 1,
+    "smart_questions_status": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "status": 1
+}
+
+SESSION_LIST_SORT = [("created_at", -1), ("_id", -1)]
+
+#user email -> (monotonic expiry, session count)
+session_counts: Dict[str, Tuple[float, int]] = {}
+
+def encode_session_cursor(session: dict, page: int) -> str:
+    """Continuation token pointing just past this session; page is the page number it starts"""
+    position = {"created_at": session["created_at"].isoformat(), "_id": str(session["_id"]), "page": page}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+def decode_session_cursor(cursor: str) -> Optional[Tuple[datetime, ObjectId, int]]:
+    """(created_at, _id, page) of a continuation token, or None if it is not one of ours"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(position["created_at"]), ObjectId(position["_id"]), int(position["page"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        return None
+
+def keyset_filter(query: dict, created_at: datetime, document_id: ObjectId, operator: str) -> dict:
+    """query restricted to documents whose (created_at, _id) is $lt / $gt the given position"""
+    return {
+        **query,
+        "$or": [
+            {"created_at": {operator: created_at}},
+            {"created_at": created_at, "_id": {operator: document_id}}
+        ]
+    }
+
+def sessions_after(email: str, created_at: datetime, session_id: ObjectId) -> dict:
+    """Filter for the user's sessions that sort after (created_at, _id) in SESSION_LIST_SORT order"""
+    return keyset_filter({"user_email": email}, created_at, session_id, "$lt")
+
+def message_page_pipeline(query: dict, newest_first: bool, limit: int, include_code: bool) -> List[dict]:
+    """
+    Aggregation over the messages matching query in (created_at, _id) order, at most limit of them (0 = all).
+    Without include_code, metadata.code and metadata.code_explanation are replaced by metadata.has_code.
+    """
+    direction = -1 if newest_first else 1
+    pipeline = [{"$match": query}, {"$sort": {"created_at": direction, "_id": direction}}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    if not include_code:
+        pipeline += [
+            {"$set": {"metadata.has_code": {"$ne": [{"$ifNull": ["$metadata.code", None]}, None]}}},
+            {"$unset": ["metadata.code", "metadata.code_explanation"]}
+        ]
+    return pipeline
+
+async def count_user_sessions(collection, email: str) -> int:
+    """Number of sessions the user has, cached for SESSION_COUNT_CACHE_TTL_SECONDS"""
+    cached = session_counts.get(email)
+    if cached is not None and time.monotonic() < cached[0]:
+        return cached[1]
+    count = await collection.count_documents({"user_email": email})
+    session_counts[email] = (time.monotonic() + settings.SESSION_COUNT_CACHE_TTL_SECONDS, count)
+    return count
+
+def invalidate_session_count(email: str):
+    session_counts.pop(email, None)
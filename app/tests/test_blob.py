@@ -0,0 +1,74 @@
+'''
+NOTE:
+1.This is a test file for the PipelinedBlockUploader in the db/blob.py file.
+'''
+
+import asyncio
+import base64
+import pytest
+from app.db.blob import PipelinedBlockUploader
+
+class FakeBlobClient:
+    """Records staged blocks; later blocks finish first so out of order completion is exercised"""
+
+    def __init__(self, fail_block: int = None):
+        self.fail_block = fail_block
+        self.staged = {}
+        self.committed = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def stage_block(self, block_id, data):
+        block_number = int(base64.b64decode(block_id).decode().split("-")[1])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01 * (5 - block_number % 5))
+            if block_number == self.fail_block:
+                raise RuntimeError(f"block {block_number} failed")
+            self.staged[block_id] = data
+        finally:
+            self.in_flight -= 1
+
+    async def commit_block_list(self, block_list, **kwargs):
+        self.committed = [block.id for block in block_list]
+        return {"etag": "etag"}
+
+async def upload(uploader: PipelinedBlockUploader, data: bytes, chunk_size: int = 7):
+    for start in range(0, len(data), chunk_size):
+        await uploader.write(data[start:start + chunk_size])
+
+@pytest.mark.asyncio
+async def test_blocks_are_committed_in_write_order():
+    data = bytes(range(256)) * 4
+    blob_client = FakeBlobClient()
+    uploader = PipelinedBlockUploader(blob_client, block_size=100, max_in_flight=3)
+    await upload(uploader, data)
+    result = await uploader.commit(content_type="text/csv")
+
+    assert result == {"etag": "etag"}
+    assert blob_client.committed == uploader.block_ids
+    assert len(uploader.block_ids) == 11
+    assert b"".join(blob_client.staged[block_id] for block_id in blob_client.committed) == data
+
+@pytest.mark.asyncio
+async def test_staging_never_exceeds_the_in_flight_limit():
+    blob_client = FakeBlobClient()
+    uploader = PipelinedBlockUploader(blob_client, block_size=10, max_in_flight=2)
+    await upload(uploader, b"x" * 200)
+    await uploader.commit()
+
+    assert blob_client.max_in_flight == 2
+
+@pytest.mark.asyncio
+async def test_a_failed_block_fails_the_upload_without_committing():
+    blob_client = FakeBlobClient(fail_block=1)
+    uploader = PipelinedBlockUploader(blob_client, block_size=10, max_in_flight=2)
+
+    with pytest.raises(RuntimeError, match="block 1 failed"):
+        await upload(uploader, b"x" * 200)
+        await uploader.commit()
+    await uploader.abort()
+
+    assert blob_client.committed is None
+    assert all(task.done() for task in uploader.tasks)
@@ -0,0 +1,89 @@
+'''
+NOTE:
+1.This is a test file for the deep_analysis/utils.py file (finding the chart a KPI response produced).
+'''
+
+import time
+from types import SimpleNamespace
+import pytest
+from app.deep_analysis.utils import FILE_ID_PATTERN, extract_file_id_from_response, find_file_id_in_outputs
+
+CHART_ID = "cfile_6845a1b2c3d4e5f6a7b8c9d0e1f2a3b4"
+CSV_ID = "cfile_0011223344556677889900aabbccddee"
+
+def annotated_message(file_id: str, filename: str) -> dict:
+    return {
+        "type": "message",
+        "content": [{"type": "output_text", "text": "Here is the chart", "annotations": [
+            {"type": "container_file_citation", "file_id": file_id, "filename": filename}
+        ]}]
+    }
+
+class FakeContainerFiles:
+    """containers.files of the OpenAI client, over a fixed list of (id, created_at, path), newest first"""
+
+    def __init__(self, files):
+        self.files = [SimpleNamespace(id=file_id, created_at=created_at, path=path, source="assistant")
+                      for file_id, created_at, path in files]
+
+    async def retrieve(self, file_id, container_id):
+        for container_file in self.files:
+            if container_file.id == file_id:
+                return container_file
+        raise LookupError(file_id)
+
+    def list(self, container_id, order, limit):
+        async def newest_first():
+            for container_file in self.files:
+                yield container_file
+        return newest_first()
+
+def fake_client(files):
+    return SimpleNamespace(containers=SimpleNamespace(files=FakeContainerFiles(files)))
+
+def test_file_id_pattern_matches_only_real_id_shapes():
+    text = f"A file-based approach, see file-2024 and {CHART_ID} or file-Ab12Cd34Ef56Gh78Ij90Kl"
+
+    assert FILE_ID_PATTERN.findall(text) == [CHART_ID, "file-Ab12Cd34Ef56Gh78Ij90Kl"]
+
+def test_image_annotation_is_the_chart():
+    response = {"output": [annotated_message(CHART_ID, "revenue.png")]}
+
+    assert find_file_id_in_outputs(response) == (CHART_ID, "annotation")
+
+def test_non_image_files_are_not_charts():
+    response = {"output": [
+        annotated_message(CSV_ID, "cleaned.csv"),
+        {"type": "code_interpreter_call", "results": [{"type": "files", "files": [
+            {"file_id": CSV_ID, "mime_type": "text/csv"},
+            {"file_id": CHART_ID, "mime_type": "image/png"}
+        ]}]}
+    ]}
+
+    assert find_file_id_in_outputs(response) == (CHART_ID, "code_interpreter_result")
+
+@pytest.mark.asyncio
+async def test_regex_scan_only_returns_image_files_of_the_container():
+    response = {"output": [], "text": f"Saved {CSV_ID} and {CHART_ID} with a file-based cache"}
+    client = fake_client([(CHART_ID, 100, "/mnt/data/chart.png"), (CSV_ID, 100, "/mnt/data/out.csv")])
+
+    assert await extract_file_id_from_response(response) is None
+    assert await extract_file_id_from_response(response, client, "cntr_1") == CHART_ID
+
+@pytest.mark.asyncio
+async def test_concurrent_kpis_never_claim_the_same_chart():
+    now = int(time.time())
+    client = fake_client([
+        ("cfile_written_after_both_finished", now + 60, "/mnt/data/late.png"),
+        ("cfile_newest_in_window", now - 2, "/mnt/data/b.png"),
+        ("cfile_older_in_window", now - 5, "/mnt/data/a.png"),
+        ("cfile_before_both_started", now - 100, "/mnt/data/old.png"),
+    ])
+    claimed = set()
+
+    first = await extract_file_id_from_response({"output": [], "created_at": now - 10}, client, "cntr_1", claimed, now)
+    second = await extract_file_id_from_response({"output": [], "created_at": now - 10}, client, "cntr_1", claimed, now)
+    third = await extract_file_id_from_response({"output": [], "created_at": now - 10}, client, "cntr_1", claimed, now)
+
+    assert (first, second, third) == ("cfile_newest_in_window", "cfile_older_in_window", None)
+    assert claimed == {"cfile_newest_in_window", "cfile_older_in_window"}
@@ -4,7 +4,7 @@ NOTE:
 '''
 
 import pytest
-from app.db.mongo import get_client, get_db
+from app.db.mongo import get_client, get_db, ErrorSink
 from pymongo import AsyncMongoClient
 
 @pytest.mark.asyncio
@@ -16,3 +16,13 @@ async def test_get_client_returns_instance():
 async def test_get_db_returns_database():
     db = await get_db()
     assert db.name == "deep_analysis"
+
+def test_error_sink_merges_only_errors_from_the_same_place():
+    sink = ErrorSink(flush_seconds=60, max_pending=10)
+    for _ in range(3):
+        sink.add(ValueError("bad"), "chat/routes.py", "chat_response")
+    sink.add(ValueError("bad"), "chat/routes.py", "chat_summary")
+    sink.add(KeyError("bad"), "chat/routes.py", "chat_response")
+
+    counts = sorted((doc["additional_info"], doc["error_type"], doc["count"]) for doc in sink.pending.values())
+    assert counts == [("chat_response", "KeyError", 1), ("chat_response", "ValueError", 3), ("chat_summary", "ValueError", 1)]
@@ -0,0 +1,65 @@
+'''
+NOTE:
+1.This is a test file for the chat/profiler.py file.
+'''
+
+from app.chat.profiler import CSVProfiler, CSVRowBatcher
+
+def profile_csv(data: bytes, chunk_size: int = 7, batch_bytes: int = 64) -> dict:
+    #Small chunks and batches so rows (and quoted fields) get split across chunk boundaries
+    profiler = CSVProfiler(batch_bytes=batch_bytes)
+    for start in range(0, len(data), chunk_size):
+        profiler.feed(data[start:start + chunk_size])
+    return profiler.finish()
+
+def test_profile_counts_every_row_and_infers_dtypes():
+    rows = ["id,price,region,day,active"]
+    for i in range(100):
+        region = '"North, ""big""\nsite"' if i % 4 == 0 else "South"
+        price = "" if i % 10 == 0 else f"{i}.5"
+        rows.append(f"{i},{price},{region},2024-01-{i % 28 + 1:02d},{'true' if i % 2 else 'false'}")
+    profile = profile_csv("\n".join(rows).encode())
+
+    assert profile["row_count"] == 100
+    columns = {column["name"]: column for column in profile["column_profiles"]}
+    assert columns["id"]["dtype"] == "integer"
+    assert columns["id"]["min"] == 0 and columns["id"]["max"] == 99
+    assert columns["price"]["dtype"] == "float"
+    assert columns["price"]["null_count"] == 10
+    assert columns["region"]["dtype"] == "string"
+    assert columns["region"]["top_values"][0] == {"value": "South", "count": 75}
+    assert columns["day"]["dtype"] == "datetime"
+    assert columns["active"]["dtype"] == "boolean"
+    assert columns["region"]["distinct_count"] == 2
+    assert 95 <= columns["id"]["distinct_count"] <= 100
+
+def test_stray_quote_inside_a_value_does_not_hide_row_boundaries():
+    rows = ["id,screen"] + [f'{i},{i % 9 + 10}" display' for i in range(200)]
+    data = "\n".join(rows).encode()
+    batcher = CSVRowBatcher(batch_bytes=64)
+    batches = [batch for start in range(0, len(data), 7) if (batch := batcher.feed(data[start:start + 7]))]
+
+    assert len(batches) > 10
+    assert all(batch.endswith("\n") and len(batch) < 128 for batch in batches)
+    assert profile_csv(data)["row_count"] == 200
+
+def test_unterminated_quote_abandons_the_profile():
+    data = b'id,note\n1,"never closed\n' + b"2,more text\n" * 100
+    profiler = CSVProfiler(batch_bytes=64, max_pending_bytes=256)
+    for start in range(0, len(data), 7):
+        profiler.feed(data[start:start + 7])
+
+    assert profiler.failed
+    assert profiler.batcher.buffer == ""
+    assert profiler.finish() is None
+
+def test_dates_with_mixed_offsets_are_profiled_in_utc():
+    rows = ["id,seen_at"] + [
+        f"{i},2024-03-{i % 28 + 1:02d}T10:00:00{'+05:30' if i % 3 == 0 else 'Z' if i % 3 == 1 else ''}" for i in range(60)
+    ]
+    profile = profile_csv("\n".join(rows).encode())
+
+    seen_at = {column["name"]: column for column in profile["column_profiles"]}["seen_at"]
+    assert seen_at["dtype"] == "datetime"
+    assert seen_at["min"] == "2024-03-01T04:30:00+00:00"
+    assert seen_at["max"] == "2024-03-28T10:00:00+00:00"
@@ -0,0 +1,110 @@
+'''
+NOTE:
+1.This is a test file for the keyset pagination of the session list (sessions/utils.py and sessions/routes.py).
+'''
+
+import base64
+import json
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from app.sessions.routes import get_all_sessions
+from app.sessions.utils import decode_session_cursor, encode_session_cursor
+
+def matches(document: dict, query: dict) -> bool:
+    #Just enough of Mongo's query language for the session list filters
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, option) for option in condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, value in condition.items():
+                if operator == "$lt" and not document[field] < value:
+                    return False
+                if operator == "$gt" and not document[field] > value:
+                    return False
+        elif document[field] != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction == -1)
+        return self
+
+    def skip(self, count):
+        self.documents = self.documents[count:]
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents
+
+class FakeSessions:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if matches(document, query)])
+
+    async def count_documents(self, query):
+        return len([document for document in self.documents if matches(document, query)])
+
+def user_sessions(count: int, same_timestamp: int):
+    #The newest `same_timestamp` sessions were all created in the same instant, only _id tells them apart
+    now = datetime(2024, 5, 1, 12, 0, 0)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_email": "user@example.com",
+            "session_id": f"session-{i}",
+            "created_at": now if i < same_timestamp else now - timedelta(minutes=i)
+        }
+        for i in range(count)
+    ]
+
+def test_cursor_round_trip():
+    session = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30, 15, 123000)}
+    cursor = encode_session_cursor(session, 3)
+
+    assert decode_session_cursor(cursor) == (session["created_at"], session["_id"], 3)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(json.dumps({"created_at": "2024-05-01T12:00:00", "_id": "tampered", "page": 2}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"created_at": "yesterday", "_id": str(ObjectId()), "page": 2}).encode()).decode(),
+])
+async def test_malformed_or_tampered_cursor_is_rejected(cursor):
+    db = {"csv_sessions": FakeSessions([])}
+    with pytest.raises(HTTPException) as error:
+        await get_all_sessions(cursor=cursor, current_user={"email": "user@example.com"}, db=db)
+
+    assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_cursor_pages_break_ties_on_equal_timestamps():
+    documents = user_sessions(count=23, same_timestamp=7)
+    db = {"csv_sessions": FakeSessions(documents)}
+    current_user = {"email": "user@example.com"}
+
+    seen, cursor = [], None
+    while True:
+        result = await get_all_sessions(limit=3, cursor=cursor, current_user=current_user, db=db)
+        seen += [session["_id"] for session in result["sessions"]]
+        cursor = result["pagination"]["next_cursor"]
+        if cursor is None:
+            break
+
+    newest_first = sorted(documents, key=lambda document: (document["created_at"], document["_id"]), reverse=True)
+    assert seen == [str(document["_id"]) for document in newest_first]
+    assert result["pagination"]["current_page"] == 8 and result["pagination"]["has_next"] is False
@@ -34,11 +34,13 @@ const ChatSession: React.FC = () => {
   
   const [session, setSession] = useState<Session | null>(null)
   const [messages, setMessages] = useState<Message[]>([])
+  const [hasEarlierMessages, setHasEarlierMessages] = useState(false)
   const [inputValue, setInputValue] = useState('')
   const [loading, setLoading] = useState(true)
   const [sending, setSending] = useState(false)
   const [sidebarOpen, setSidebarOpen] = useState(false)
   const [copiedCode, setCopiedCode] = useState<string | null>(null)
+  const [loadingCode, setLoadingCode] = useState<string | null>(null)
   
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const inputRef = useRef<HTMLTextAreaElement>(null)
@@ -54,6 +56,42 @@ const ChatSession: React.FC = () => {
     scrollToBottom()
   }, [messages])
 
+  // Smart questions are generated after the upload returns, poll until they are ready.
+  // A failed generation is retried by the server on each poll, so keep polling with backoff while failed.
+  useEffect(() => {
+    const status = session?.smart_questions_status
+    if (!sessionId || (status !== 'pending' && status !== 'running' && status !== 'failed')) return
+
+    let cancelled = false
+    let timer: ReturnType<typeof setTimeout>
+    let delay = status === 'failed' ? 5000 : 2000
+
+    const poll = async () => {
+      try {
+        const data = await chatAPI.getSmartQuestions(sessionId)
+        if (cancelled) return
+        if (data.status !== status) {
+          setSession(prev => prev && {
+            ...prev,
+            smart_questions: data.smart_questions,
+            smart_questions_status: data.status,
+          })
+          return
+        }
+      } catch (error) {
+        console.error('Failed to load smart questions:', error)
+      }
+      if (status === 'failed') delay = Math.min(delay * 2, 60000)
+      if (!cancelled) timer = setTimeout(poll, delay)
+    }
+
+    timer = setTimeout(poll, delay)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [sessionId, session?.smart_questions_status])
+
   useEffect(() => {
     if (!sidebarOpen) {
       inputRef.current?.focus()
@@ -80,6 +118,18 @@ const ChatSession: React.FC = () => {
     try {
       const response = await sessionsAPI.getSessionMessages(sessionId!)
       setMessages(response.messages)
+      setHasEarlierMessages(response.has_more)
+    } catch (error) {
+      toast.error('Failed to load messages')
+    }
+  }
+
+  const loadEarlierMessages = async () => {
+    if (messages.length === 0) return
+    try {
+      const response = await sessionsAPI.getSessionMessages(sessionId!, { before: messages[0]._id })
+      setMessages(prev => [...response.messages, ...prev])
+      setHasEarlierMessages(response.has_more)
     } catch (error) {
       toast.error('Failed to load messages')
     }
@@ -127,6 +177,11 @@ const ChatSession: React.FC = () => {
       }
 
       setMessages(prev => [...prev.slice(0, -1), finalUserMessage, assistantMessage])
+
+      // Code explanation is generated after the answer, fetch it once it is ready
+      if (response.code && !response.code_explanation) {
+        pollCodeExplanation(response.message_id)
+      }
     } catch (error: any) {
       // Remove temp message on error
       setMessages(prev => prev.slice(0, -1))
@@ -155,6 +210,47 @@ const ChatSession: React.FC = () => {
     }
   }
 
+  // The explanation is generated in the background, poll until it is done (or give up after about a minute)
+  const pollCodeExplanation = async (messageId: string) => {
+    for (let attempt = 0; attempt < 30; attempt++) {
+      try {
+        const { code_explanation, status } = await chatAPI.getCodeExplanation(messageId)
+        if (code_explanation) {
+          setMessages(prev => prev.map(message =>
+            message._id === messageId
+              ? { ...message, metadata: { ...message.metadata, code_explanation } }
+              : message
+          ))
+          return
+        }
+        if (!status) return
+      } catch (error) {
+        return
+      }
+      await new Promise(resolve => setTimeout(resolve, 2000))
+    }
+  }
+
+  // Message pages come without code (metadata.has_code), fetch it when the user opens it
+  const showMessageCode = async (messageId: string) => {
+    setLoadingCode(messageId)
+    try {
+      const { code, code_explanation } = await sessionsAPI.getMessageCode(messageId)
+      setMessages(prev => prev.map(message =>
+        message._id === messageId
+          ? { ...message, metadata: { ...message.metadata, code, code_explanation } }
+          : message
+      ))
+      if (code && !code_explanation) {
+        pollCodeExplanation(messageId)
+      }
+    } catch (error) {
+      toast.error('Failed to load code')
+    } finally {
+      setLoadingCode(null)
+    }
+  }
+
   const handleFeedback = async (messageId: string, feedback: 'thumbs_up' | 'thumbs_down') => {
     try {
       await chatAPI.submitFeedback(messageId, feedback)
@@ -365,6 +461,17 @@ const ChatSession: React.FC = () => {
               </div>
             ) : (
               <div className="space-y-6">
+                {hasEarlierMessages && (
+                  <div className="text-center">
+                    <button
+                      onClick={loadEarlierMessages}
+                      className="text-sm px-4 py-2 rounded-lg transition-colors"
+                      style={{ background: 'var(--bg-tertiary)', color: 'var(--text-secondary)' }}
+                    >
+                      Load earlier messages
+                    </button>
+                  </div>
+                )}
                 {messages.map((message, index) => (
                   <motion.div
                     key={message._id}
@@ -437,6 +544,23 @@ const ChatSession: React.FC = () => {
                             </ReactMarkdown>
                           </div>
 
+                          {/* Code not loaded with the page yet */}
+                          {message.metadata?.has_code && !message.metadata?.code && (
+                            <button
+                              onClick={() => showMessageCode(message._id)}
+                              disabled={loadingCode === message._id}
+                              className="mt-4 flex items-center space-x-2 px-4 py-3 w-full border rounded-xl transition-colors"
+                              style={{ borderColor: 'var(--border-light)', backgroundColor: 'var(--bg-secondary)' }}
+                            >
+                              {loadingCode === message._id ? (
+                                <Loader className="h-4 w-4 animate-spin" style={{ color: 'var(--text-secondary)' }} />
+                              ) : (
+                                <Code className="h-4 w-4" style={{ color: 'var(--text-secondary)' }} />
+                              )}
+                              <span className="text-sm font-medium" style={{ color: 'var(--text-primary)' }}>Show Generated Code</span>
+                            </button>
+                          )}
+
                           {/* Code and explanation attachments */}
                           {message.metadata?.code && (
                             <div className="mt-4 border rounded-xl overflow-hidden" style={{ borderColor: 'var(--border-light)' }}>
@@ -34,6 +34,7 @@ const Dashboard: React.FC = () => {
   const [searchTerm, setSearchTerm] = useState('')
   const [currentPage, setCurrentPage] = useState(1)
   const [totalPages, setTotalPages] = useState(1)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   
   const { user, logout } = useAuth()
   const navigate = useNavigate()
@@ -41,10 +42,13 @@ const Dashboard: React.FC = () => {
   const loadSessions = async (page = 1) => {
     try {
       setLoading(true)
-      const response = await sessionsAPI.getAllSessions(page, 10)
+      // The next page can be fetched from the cursor, any other page by number
+      const cursor = page === currentPage + 1 ? nextCursor : null
+      const response = await sessionsAPI.getAllSessions(page, 10, cursor)
       setSessions(response.sessions)
       setCurrentPage(response.pagination.current_page)
       setTotalPages(response.pagination.total_pages)
+      setNextCursor(response.pagination.next_cursor)
     } catch (error) {
       toast.error('Failed to load sessions')
     } finally {
@@ -306,7 +310,7 @@ const Dashboard: React.FC = () => {
                           </span>
                                                      {session.csv_info && (
                              <span className="text-sm" style={{ color: 'var(--text-secondary)' }}>
-                               {session.csv_info.preview_data?.length} preview rows • {session.csv_info.total_columns} columns
+                               {session.csv_info.row_count ?? session.csv_info.preview_data?.length} rows • {session.csv_info.total_columns} columns
                              </span>
                            )}
                         </div>
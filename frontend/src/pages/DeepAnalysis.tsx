@@ -112,11 +112,12 @@ const DeepAnalysis: React.FC = () => {
     setProgress(progressPercent)
   }
 
-  const startAnalysis = async () => {
+  const startAnalysis = async (resume = false) => {
     if (!sessionId) return
     
     try {
-      await deepAnalysisAPI.startAnalysis(sessionId)
+      // Resuming reruns only the KPIs and stages that failed last time
+      await deepAnalysisAPI.startAnalysis(sessionId, resume)
       setAnalysisStarted(true)
       setProgress(10)
       toast.success('Deep analysis started!')
@@ -267,7 +268,7 @@ const DeepAnalysis: React.FC = () => {
             </div>
 
             <button
-              onClick={startAnalysis}
+              onClick={() => startAnalysis()}
               className="bg-gradient-to-r from-blue-600 to-purple-600 hover:from-blue-700 hover:to-purple-700 text-white px-8 py-4 rounded-xl font-semibold text-lg transition-all duration-200 transform hover:scale-105"
             >
               <div className="flex items-center space-x-3">
@@ -371,7 +372,7 @@ const DeepAnalysis: React.FC = () => {
               
               {analysisStatus?.status === 'Deep Analysis Failed' && (
                 <button
-                  onClick={startAnalysis}
+                  onClick={() => startAnalysis(true)}
                   className="px-6 py-3 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition-colors"
                 >
                   Try Again
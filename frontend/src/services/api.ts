@@ -88,6 +88,16 @@ export const chatAPI = {
     return response.data
   },
 
+  getSmartQuestions: async (sessionId: string) => {
+    const response: AxiosResponse = await apiClient.get(`/chat/smart_questions/${sessionId}`)
+    return response.data
+  },
+
+  getCodeExplanation: async (messageId: string) => {
+    const response: AxiosResponse = await apiClient.get(`/chat/code_explanation/${messageId}`)
+    return response.data
+  },
+
   submitFeedback: async (messageId: string, feedback: 'thumbs_up' | 'thumbs_down') => {
     const response: AxiosResponse = await apiClient.post('/chat/feedback', null, {
       params: {
@@ -110,9 +120,9 @@ export const chatAPI = {
 
 // Sessions API
 export const sessionsAPI = {
-  getAllSessions: async (page = 1, limit = 10) => {
+  getAllSessions: async (page = 1, limit = 10, cursor: string | null = null) => {
     const response: AxiosResponse = await apiClient.get('/sessions/get_all_sessions', {
-      params: { page, limit }
+      params: cursor ? { cursor, limit } : { page, limit }
     })
     return response.data
   },
@@ -131,9 +141,25 @@ export const sessionsAPI = {
     return response.data
   },
 
-  getSessionMessages: async (sessionId: string) => {
+  getSessionMessages: async (
+    sessionId: string,
+    options: { after?: string; before?: string; limit?: number; includeCode?: boolean } = {}
+  ) => {
     const response: AxiosResponse = await apiClient.get('/sessions/get_session_messages', {
-      params: { session_id: sessionId }
+      params: {
+        session_id: sessionId,
+        after: options.after,
+        before: options.before,
+        limit: options.limit,
+        include_code: options.includeCode
+      }
+    })
+    return response.data
+  },
+
+  getMessageCode: async (messageId: string) => {
+    const response: AxiosResponse = await apiClient.get('/sessions/get_message_code', {
+      params: { message_id: messageId }
     })
     return response.data
   }
@@ -141,9 +167,9 @@ export const sessionsAPI = {
 
 // Deep Analysis API
 export const deepAnalysisAPI = {
-  startAnalysis: async (sessionId: string) => {
+  startAnalysis: async (sessionId: string, resume = false) => {
     const response: AxiosResponse = await apiClient.post('/deep_analysis/start', null, {
-      params: { session_id: sessionId }
+      params: { session_id: sessionId, resume }
     })
     return response.data
   },
@@ -18,10 +18,12 @@ export interface Session {
   }
   csv_info: {
     total_columns: number
-    column_names: string[]
-    preview_data: Record<string, any>[]
+    column_names?: string[]
+    preview_data?: Record<string, any>[]
+    row_count?: number
   }
   smart_questions: string[]
+  smart_questions_status?: 'pending' | 'running' | 'done' | 'failed' | null
   created_at: string
   updated_at: string
   status: string
@@ -38,6 +40,7 @@ export interface Message {
     code?: string
     code_explanation?: string
     file_url?: string
+    has_code?: boolean
   }
 }
 
@@ -45,6 +48,7 @@ export interface ChatResponse {
   response: string
   code?: string
   code_explanation?: string
+  code_explanation_status?: 'pending' | 'running' | 'done' | 'failed' | null
   file_url?: string
   message_id: string
 }
@@ -63,6 +67,7 @@ export interface UploadResponse {
     content_type: string
   }
   smart_questions: string[]
+  smart_questions_status?: 'pending' | 'running' | 'done' | 'failed' | null
   message: string
   success: boolean
 }